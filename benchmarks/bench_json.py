@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Compare the JSON codecs installed, on replies of /entry/.
+
+Usage: python benchmarks/bench_json.py [number of entries per reply]"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from wididit import jsoncodec
+from fixtures import make_reply
+
+def make_entries(count):
+    return [make_reply(x, content=u'Entry number %i, with #some #tags/nested '
+        u'and n\xf6n-ASCII text.' % x) for x in range(count)]
+
+def main(count):
+    entries = make_entries(count)
+    content = jsoncodec.get_codec('json').dumps(entries).encode('utf8')
+    print('Reply of %i entries, %i bytes' % (count, len(content)))
+    for name in jsoncodec.available():
+        codec = jsoncodec.get_codec(name)
+        number = max(1, 100000 // count)
+        loads = timeit.timeit(lambda:codec.loads(content), number=number)
+        dumps = timeit.timeit(lambda:codec.dumps(entries), number=number)
+        print('%-12s loads %8.1f MB/s   dumps %8.1f MB/s' % (name,
+            len(content) * number / loads / 1e6,
+            len(content) * number / dumps / 1e6))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
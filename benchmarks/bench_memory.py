@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Measure the memory used by entries held in memory, as Entry instances
+and in the layout entries had before Entry was slotted: attributes in a
+__dict__, times as struct_time and contributors in a list.
+
+Usage: python benchmarks/bench_memory.py [number of entries]
+
+It requires Python 3 (for tracemalloc)."""
+
+import os
+import sys
+import gc
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from wididit import utils
+from wididit import People, Entry
+from fixtures import make_reply
+
+class DictEntry(object):
+    """An entry stored as Entry stored it before it was slotted."""
+    def __init__(self, reply):
+        self._author = People.from_anything(reply['author'])
+        self._id = reply['id']
+        self._content = reply['content']
+        self._category = reply['category']
+        self._contributors = [People.from_anything(x)
+                for x in reply['contributors']]
+        self._generator = reply['generator']
+        self._published = time.strptime(reply['published'],
+                utils.TIME_FORMAT)
+        self._rights = reply['rights']
+        self._source = reply['source']
+        self._subtitle = reply['subtitle']
+        self._summary = reply['summary']
+        self._title = reply['title']
+        self._updated = time.strptime(reply['updated'], utils.TIME_FORMAT)
+
+def measure(build, replies):
+    """Return the memory held by the objects built from the replies, in
+    bytes per entry."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entries = [build(x) for x in replies]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(entries)
+
+def main(count):
+    replies = [make_reply(x) for x in range(count)]
+    print('%i entries:' % count)
+    for (name, build) in (('__dict__ layout', DictEntry),
+            ('Entry', Entry.from_reply)):
+        print('%-16s %6i bytes per entry' % (name, measure(build, replies)))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Compare building tag trees entry by entry (with the former recursive
+implementation and with :py:func:`wididit.utils.get_tag_tree`) and in bulk
+with :py:func:`wididit.utils.get_tag_tree_many`.
+
+Usage: python benchmarks/bench_tags.py [number of entries]"""
+
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from wididit import utils
+
+def _tag_process_tree(tree, tags):
+    if len(tags) == 0:
+        return
+    tag = ''
+    while tag == '':
+        tag = tags.pop(0)
+    if tag not in tree:
+        tree.update({tag: {}})
+    _tag_process_tree(tree[tag], tags)
+def recursive_get_tag_tree(content):
+    tree = {}
+    for tag in utils.get_tags(content):
+        _tag_process_tree(tree, tag.split('#'))
+    return tree
+
+def merge(tree, other):
+    for (name, child) in other.items():
+        merge(tree.setdefault(name, {}), child)
+
+def make_contents(count):
+    random.seed(0)
+    words = ['wididit', 'python', 'lol', 'test', 'spam', 'egg', 'bacon']
+    contents = []
+    for x in range(count):
+        tags = ['#' + '#'.join(random.sample(words, random.randint(1, 4)))
+                for y in range(random.randint(0, 3))]
+        contents.append('Entry number %i, talking about %s.' %
+                (x, ' and '.join(tags) or 'nothing'))
+    return contents
+
+def report(name, function):
+    start = timeit.default_timer()
+    function()
+    duration = timeit.default_timer() - start
+    print('%-40s %8.3f s' % (name, duration))
+
+def main(count):
+    contents = make_contents(count)
+    def per_entry(get_tag_tree):
+        def function():
+            tree = {}
+            for content in contents:
+                merge(tree, get_tag_tree(content))
+        return function
+    report('recursive get_tag_tree + merge', per_entry(recursive_get_tag_tree))
+    report('utils.get_tag_tree + merge', per_entry(utils.get_tag_tree))
+    report('utils.get_tag_tree_many (with counts)',
+            lambda:utils.get_tag_tree_many(contents))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
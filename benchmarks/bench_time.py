@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Compare the time parsing and formatting of :py:mod:`wididit.utils` with
+time.strptime and time.strftime.
+
+Usage: python benchmarks/bench_time.py [number of timestamps]"""
+
+import os
+import sys
+import time
+import timeit
+import calendar
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from wididit import utils
+
+def report(name, function, values):
+    start = timeit.default_timer()
+    for value in values:
+        function(value)
+    duration = timeit.default_timer() - start
+    print('%-32s %8.3f us per call' % (name, duration * 1e6 / len(values)))
+
+def main(count):
+    timestamps = [1325260505 + x * 61 for x in range(count)]
+    strings = [utils.format_time(x) for x in timestamps]
+    # Timelines repeat few distinct times (entries of a same minute, etc.)
+    repeated = [strings[x % 100] for x in range(count)]
+    report('strptime + timegm (distinct)',
+            lambda x:calendar.timegm(time.strptime(x, utils.TIME_FORMAT)),
+            strings)
+    report('utils.parse_time (distinct)', utils.parse_time, strings)
+    report('utils.parse_time (repeated)', utils.parse_time, repeated)
+    report('gmtime + strftime',
+            lambda x:time.strftime(utils.TIME_FORMAT, time.gmtime(x)),
+            timestamps)
+    # Building the strings above filled the cache.
+    utils._formatted_times.clear()
+    report('utils.format_time (distinct)', utils.format_time, timestamps)
+    report('utils.format_time (repeated)', utils.format_time,
+            [timestamps[x % 100] for x in range(count)])
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
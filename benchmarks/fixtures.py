@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Synthetic server replies shared by the benchmarks."""
+
+def make_reply(id_, **fields):
+    """Return an entry as sent by servers, with varied authors, servers,
+    tags and times. Fields can be replaced with keyword-arguments."""
+    reply = {
+            'id': id_,
+            'content': 'Content of entry %i, about #wididit#python and '
+                       '#tag%i.' % (id_, id_ % 50),
+            'author': {'username': 'author%i' % (id_ % 100),
+                'server': {'hostname': 'server%i.example.com' % (id_ % 10)}},
+            'category': '',
+            'contributors': ['contributor%i@example.com' % (id_ % 7)],
+            'generator': 'Wididit python library',
+            'published': '2012-01-%02i 12:%02i:00' % (id_ % 28 + 1, id_ % 60),
+            'rights': '',
+            'source': '',
+            'subtitle': '',
+            'summary': '',
+            'title': 'Title %i' % id_,
+            'updated': '2012-01-%02i 13:%02i:00' % (id_ % 28 + 1, id_ % 60),
+            }
+    reply.update(fields)
+    return reply
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Load test: concurrent clients sending requests to a local stand-in
+server (see ``tests/localserver.py``), or to another server.
+
+It reports the throughput and the latency percentiles of each operation,
+and the requests sent per endpoint.
+
+Usage:
+    python benchmarks/load.py [--clients 8] [--duration 10]
+                              [--latency 0.005] [--error-rate 0]
+                              [--people 20] [--entries 50] [--content-size 200]
+                              [--page-size 50] [--api-base URL]"""
+
+import os
+import sys
+import random
+import timeit
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+from wididit import Server, People, Entry
+from wididit import exceptions
+from wididit.metrics import Metrics
+from localserver import LocalServer
+
+HOSTNAME = 'load.wididit.net'
+
+def fetch_timeline(server, options):
+    Entry.Query(server, Entry.Query.MODE_ALL) \
+            .paginate(options.page_size).limit(options.page_size * 2).fetch()
+
+def search(server, options):
+    Entry.Query(server, Entry.Query.MODE_ALL) \
+            .filterContent('#tag%i' % random.randrange(10)).fetch()
+
+def sync_people(server, options):
+    People('user%i' % random.randrange(options.people), HOSTNAME).sync()
+
+def sync_entry(server, options):
+    Entry('user%i@%s' % (random.randrange(options.people), HOSTNAME),
+            random.randrange(options.entries) + 1).sync()
+
+operations = [fetch_timeline, search, sync_people, sync_people, sync_entry,
+        sync_entry]
+
+def client(server, options, deadline, latencies, errors):
+    while timeit.default_timer() < deadline:
+        operation = random.choice(operations)
+        start = timeit.default_timer()
+        try:
+            operation(server, options)
+        except (exceptions.WididitException, AssertionError):
+            errors[operation.__name__] = errors.get(operation.__name__, 0) + 1
+            continue
+        latencies.setdefault(operation.__name__, []) \
+                .append(timeit.default_timer() - start)
+
+def percentile(values, quantile):
+    return values[min(len(values) - 1, int(quantile * len(values)))]
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10,
+            help='in seconds')
+    parser.add_argument('--latency', type=float, default=0.005,
+            help='latency of the local server, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--people', type=int, default=20)
+    parser.add_argument('--entries', type=int, default=50,
+            help='number of entries per people')
+    parser.add_argument('--content-size', type=int, default=200)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--api-base', help='use this server instead of a '
+            'local one (it should be populated like a local one)')
+    options = parser.parse_args(argv)
+
+    local = None
+    if options.api_base is None:
+        local = LocalServer(HOSTNAME, latency=options.latency,
+                error_rate=options.error_rate)
+        local.populate(options.people, options.entries, options.content_size)
+        local.start()
+    server = Server(HOSTNAME, pool_size=options.clients)
+    if local is None:
+        server._force_api_base(options.api_base)
+    else:
+        local.connect(server)
+    metrics = Metrics()
+    server.add_observer(metrics)
+
+    latencies = [{} for x in range(options.clients)]
+    errors = [{} for x in range(options.clients)]
+    start = timeit.default_timer()
+    deadline = start + options.duration
+    threads = [threading.Thread(target=client,
+        args=(server, options, deadline, latencies[x], errors[x]))
+        for x in range(options.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = timeit.default_timer() - start
+    server.close()
+    if local is not None:
+        local.stop()
+
+    print('%i clients, %.1f s' % (options.clients, duration))
+    print('%-16s %8s %8s %8s %9s %9s %9s' % ('operation', 'count', 'errors',
+        'op/s', 'p50 (ms)', 'p90 (ms)', 'p99 (ms)'))
+    names = []
+    for operation in operations:
+        if operation.__name__ not in names:
+            names.append(operation.__name__)
+    for name in names:
+        values = sorted(sum([x.get(name, []) for x in latencies], []))
+        failures = sum([x.get(name, 0) for x in errors])
+        if not values:
+            continue
+        print('%-16s %8i %8i %8.1f %9.2f %9.2f %9.2f' % tuple(
+            [name, len(values), failures, len(values) / duration] +
+            [percentile(values, x) * 1000 for x in (0.5, 0.9, 0.99)]))
+    print('')
+    print('%-32s %8s %9s %12s' % ('endpoint', 'requests', 'req/s', 'bytes'))
+    for (endpoint, stats) in sorted(metrics.snapshot().items()):
+        print('%-32s %8i %9.1f %12i' % (endpoint, stats['count'],
+            stats['count'] / duration, stats['bytes']))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Benchmarks of the hot paths of the library, run offline against
+FakeServer with synthetic replies.
+
+For each benchmark, it reports the number of requests sent to the fake
+server, the wall time (best of several runs), and (with Python 3) the number
+of memory blocks allocated and not freed by the run, and the peak of memory
+it used, traced by tracemalloc.
+
+Usage:
+    python benchmarks/suite.py [--count N] [--sizes 10,1000,100000]
+                               [--save FILE] [--compare FILE]
+                               [--tolerance 0.2] [benchmark names...]
+
+With --compare, results are compared to a file written by --save, and the
+exit status is 1 if a benchmark sends more requests, or takes more time or
+memory than the baseline plus the tolerance."""
+
+import os
+import sys
+import gc
+import json
+import timeit
+import argparse
+import unittest # Makes wididit use FakeServer
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import wididit
+from wididit import utils
+from wididit import Server, People, Entry
+from wididit.wididitobject import WididitObject
+from fixtures import make_reply
+
+class FakeAPI(object):
+    """Callback of FakeServer, replying to /entry/ with `size` entries and
+    counting requests."""
+    def __init__(self, size=0):
+        self.requests = 0
+        self._content = Server.serialize([make_reply(x)
+            for x in range(size)])
+        self._entry = Server.serialize(make_reply(1))
+
+    def _response(self, content):
+        self.requests += 1
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        response._content = content
+        return response
+
+    def get(self, url, **kwargs):
+        if url.startswith('/entry/') and url.count('/') > 3:
+            return self._response(self._entry)
+        return self._response(self._content)
+
+    def put(self, url, **kwargs):
+        return self._response(self._entry)
+    post = delete = put
+
+def install(size=0):
+    """Make FakeServer reply with a new FakeAPI, and return it."""
+    api = wididit._test_callback = FakeAPI(size)
+    return api
+
+def query_fetch(size):
+    def setup():
+        return install(size), Server('bench.example.com')
+    def run(api, server):
+        Entry.Query(server, Entry.Query.MODE_ALL).fetch()
+    return setup, run
+
+def people_from_anything(count):
+    def setup():
+        replies = [make_reply(x)['author'] for x in range(count)]
+        return install(), replies
+    def run(api, replies):
+        for reply in replies:
+            People.from_anything(reply)
+    return setup, run
+
+def as_serializable(count):
+    def setup():
+        return install(), [Entry.from_reply(make_reply(x))
+                for x in range(count)]
+    def run(api, entries):
+        for entry in entries:
+            entry.as_serializable
+    return setup, run
+
+def get_tag_tree(count):
+    def setup():
+        return install(), [make_reply(x)['content'] for x in range(count)]
+    def run(api, contents):
+        for content in contents:
+            utils.get_tag_tree(content)
+    return setup, run
+
+def editable_setter(count):
+    def setup():
+        return install(), Entry.from_reply(make_reply(1))
+    def run(api, entry):
+        for x in range(count):
+            entry.title = 'Title %i' % x
+    return setup, run
+
+def get_benchmarks(count, sizes):
+    benchmarks = [('query_fetch_%i' % x, query_fetch(x)) for x in sizes]
+    benchmarks += [
+            ('people_from_anything', people_from_anything(count)),
+            ('as_serializable', as_serializable(count)),
+            ('get_tag_tree', get_tag_tree(count)),
+            ('editable_setter', editable_setter(max(1, count // 10))),
+            ]
+    return benchmarks
+
+def measure(setup, run, repeat):
+    """Return the results of a benchmark, as a dict."""
+    times = []
+    for x in range(repeat):
+        WididitObject.clear_instances()
+        arguments = setup()
+        gc.collect()
+        start = timeit.default_timer()
+        run(*arguments)
+        times.append(timeit.default_timer() - start)
+    result = {'requests': arguments[0].requests, 'time': min(times),
+            'allocations': None, 'peak': None}
+    if tracemalloc is not None:
+        WididitObject.clear_instances()
+        arguments = setup()
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        if hasattr(tracemalloc, 'reset_peak'): # Python 3.9
+            tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run(*arguments)
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        result['allocations'] = sum([max(0, x.count_diff)
+            for x in after.compare_to(before, 'lineno')])
+        result['peak'] = peak - base
+    WididitObject.clear_instances()
+    wididit._test_callback = None
+    return result
+
+def compare(results, baseline, tolerance):
+    """Return the descriptions of the regressions."""
+    regressions = []
+    for (name, result) in sorted(results.items()):
+        if name not in baseline:
+            continue
+        reference = baseline[name]
+        if result['requests'] > reference['requests']:
+            regressions.append('%s: %i requests instead of %i' %
+                    (name, result['requests'], reference['requests']))
+        for key in ('time', 'peak'):
+            if result[key] is None or reference.get(key) is None:
+                continue
+            if result[key] > reference[key] * (1 + tolerance):
+                regressions.append('%s: %s is %.3g instead of %.3g' %
+                        (name, key, result[key], reference[key]))
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('names', nargs='*',
+            help='benchmarks to run (default: all)')
+    parser.add_argument('--count', type=int, default=10000,
+            help='number of objects handled by benchmarks other than '
+                 'query_fetch')
+    parser.add_argument('--sizes', default='10,1000,100000',
+            help='numbers of entries in the replies of query_fetch')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='write the results to this file')
+    parser.add_argument('--compare', help='compare to results in this file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    options = parser.parse_args(argv)
+
+    sizes = [int(x) for x in options.sizes.split(',') if x]
+    results = {}
+    print('%-24s %9s %11s %12s %12s' %
+            ('benchmark', 'requests', 'time (s)', 'allocations', 'peak (B)'))
+    for (name, (setup, run)) in get_benchmarks(options.count, sizes):
+        if options.names and name not in options.names:
+            continue
+        result = results[name] = measure(setup, run, options.repeat)
+        print('%-24s %9i %11.4f %12s %12s' % (name, result['requests'],
+            result['time'], result['allocations'], result['peak']))
+    if options.save:
+        with open(options.save, 'w') as fd:
+            json.dump(results, fd, indent=4, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as fd:
+            regressions = compare(results, json.load(fd), options.tolerance)
+        for regression in regressions:
+            print('REGRESSION %s' % regression)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,358 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""A local stand-in of a Wididit server, storing everything in memory, for
+load tests and benchmarks over real HTTP connections.
+
+.. code-block:: python
+
+    local = LocalServer('bench.local', latency=0.005, error_rate=0.01)
+    local.populate(people=10, entries=100, content_size=200)
+    with local:
+        server = local.connect(Server('bench.local'))
+        entries = Entry.Query(server, Entry.Query.MODE_ALL).fetch()
+
+It implements ``/whoami/``, ``/people/``, ``/entry/`` and
+``/entry/timeline/`` (where the timeline of a user contains the entries of
+everyone). Requests fail with a 503 status at the given rate, and are
+answered after the given latency (plus a random jitter).
+"""
+
+import json
+import time
+import base64
+import random
+import hashlib
+import threading
+import email.utils
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError: # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+from wididit import utils
+
+_entry_fields = ('content', 'category', 'generator', 'rights', 'source',
+        'subtitle', 'summary', 'title')
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1 # Send headers and content at once
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self, method):
+        local = self.server.local
+        url = urlparse(self.path)
+        path = url.path
+        if path.startswith('/api/json/'):
+            path = path[len('/api/json'):]
+        params = parse_qs(url.query, keep_blank_values=True)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        data = parse_qs(body.decode('utf8'), keep_blank_values=True)
+        status, headers, content = local.handle(method, path, params, data,
+                self.headers)
+        if content is None:
+            content = b''
+        elif not isinstance(content, bytes):
+            content = json.dumps(content).encode('utf8')
+            headers['Content-Type'] = 'application/json'
+        self.send_response(status)
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(content)
+
+    def do_GET(self):
+        self._handle('GET')
+    def do_POST(self):
+        self._handle('POST')
+    def do_PUT(self):
+        self._handle('PUT')
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+class LocalServer(object):
+    """A Wididit server listening on a local port.
+
+    :param hostname: The hostname users of this server are registered on.
+    :param address: The (host, port) address to listen on. The default port
+                    (0) is chosen by the system.
+    :param latency: The time (in seconds) before answering each request.
+    :param jitter: The maximum random time added to the latency.
+    :param error_rate: The probability of answering a request with a 503
+                       (Service Unavailable) error.
+    """
+    def __init__(self, hostname='localhost', address=('127.0.0.1', 0),
+            latency=0, jitter=0, error_rate=0):
+        self.hostname = hostname
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        """The number of requests handled."""
+        self._lock = threading.Lock()
+        self._people = {}
+        self._entries = []
+        self._entry_index = {}
+        self._last_ids = {}
+        self._httpd = _HTTPServer(address, _Handler)
+        self._httpd.local = self
+        self._thread = None
+
+    @property
+    def address(self):
+        """The (host, port) address the server listens on."""
+        return self._httpd.server_address[:2]
+
+    @property
+    def api_base(self):
+        """The base URL of the API, to be given to
+        :py:meth:`wididit.Server._force_api_base`."""
+        return 'http://%s:%i/api/json' % self.address
+
+    def connect(self, server):
+        """Make a :py:class:`wididit.Server` send its requests to this
+        server, and return it."""
+        server._force_api_base(self.api_base)
+        return server
+
+    def start(self):
+        """Serve requests in a background thread, and return the server."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests and close the socket."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def add_people(self, username, password=None, biography=''):
+        """Register a user, and return its userid."""
+        userid = '%s@%s' % (username, self.hostname)
+        with self._lock:
+            self._people[userid] = {'username': username,
+                    'password': password, 'biography': biography}
+        return userid
+
+    def add_entry(self, author, **fields):
+        """Create an entry, and return its ID.
+
+        :param author: The userid of a registered user.
+        :param **fields: The fields of the entry.
+        """
+        with self._lock:
+            return self._add_entry(author, fields)
+
+    def _add_entry(self, author, fields):
+        now = utils.format_time(int(time.time()))
+        id_ = self._last_ids[author] = self._last_ids.get(author, 0) + 1
+        entry = dict([(x, fields.get(x, '')) for x in _entry_fields])
+        entry.update({'id': id_, 'author': author,
+            'contributors': list(fields.get('contributors', [])),
+            'published': fields.get('published', now),
+            'updated': fields.get('updated', now)})
+        self._entries.append(entry)
+        self._entry_index[(author, id_)] = entry
+        return id_
+
+    def populate(self, people=10, entries=100, content_size=100):
+        """Register users (user0, user1, ..., with password 'password'), each
+        writing this number of entries, whose content has (at least) this
+        size."""
+        for x in range(people):
+            userid = self.add_people('user%i' % x, 'password',
+                    'Biography of user %i.' % x)
+            for y in range(entries):
+                content = ('Entry %i of %s, #bench#tag%i ' %
+                        (y, userid, y % 10)).ljust(content_size, 'x')
+                self.add_entry(userid, content=content, title='Entry %i' % y,
+                        generator='localserver')
+
+    def _authenticate(self, headers):
+        """Return the userid of the authenticated user, or None."""
+        authorization = headers.get('Authorization') or ''
+        if not authorization.startswith('Basic '):
+            return None
+        credentials = base64.b64decode(authorization[6:].encode('ascii'))
+        username, password = credentials.decode('utf8').split(':', 1)
+        userid = '%s@%s' % (username, self.hostname)
+        people = self._people.get(userid)
+        if people is None or people['password'] != password:
+            return None
+        return userid
+
+    def handle(self, method, path, params, data, headers):
+        """Answer a request, and return its status, headers and content (as
+        bytes, or as data to be serialized in JSON)."""
+        with self._lock:
+            self.requests += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            return 503, {}, None
+        parts = [x for x in path.split('/') if x]
+        user = self._authenticate(headers)
+        if parts in (['entry'], ['entry', 'timeline']) and method == 'GET':
+            if parts[1:] and user is None:
+                return 403, {}, None
+            # Entries are replaced instead of being updated, so only the
+            # list needs to be copied while locked.
+            with self._lock:
+                entries = self._entries[:]
+            return 200, {}, self._query(entries, params)
+        with self._lock:
+            if parts == ['whoami']:
+                if user is None:
+                    return 403, {}, None
+                return 200, {}, self._people_reply(user)
+            elif parts == ['people'] and method == 'POST':
+                return self._register(data)
+            elif len(parts) == 2 and parts[0] == 'people':
+                return self._people_resource(method, parts[1], user, data,
+                        headers)
+            elif parts == ['entry'] and method == 'POST':
+                return self._create(user, data)
+            elif len(parts) == 3 and parts[0] == 'entry' and \
+                    parts[2].isdigit():
+                return self._entry_resource(method, parts[1], int(parts[2]),
+                        user, data, headers)
+        return 404, {}, None
+
+    def _people_reply(self, userid):
+        people = self._people[userid]
+        return {'username': people['username'],
+                'biography': people['biography'],
+                'server': {'hostname': self.hostname}}
+
+    def _register(self, data):
+        username = data.get('username', [''])[0]
+        userid = '%s@%s' % (username, self.hostname)
+        if not username or userid in self._people:
+            return 409, {}, None
+        self._people[userid] = {'username': username,
+                'password': data.get('password', [None])[0],
+                'biography': ''}
+        return 201, {}, None
+
+    def _people_resource(self, method, userid, user, data, headers):
+        if userid not in self._people:
+            return 404, {}, None
+        if method == 'GET':
+            reply = self._people_reply(userid)
+            etag = '"%s"' % hashlib.sha1(
+                    json.dumps(reply, sort_keys=True).encode('utf8')) \
+                    .hexdigest()
+            if headers.get('If-None-Match') == etag:
+                return 304, {'ETag': etag}, None
+            return 200, {'ETag': etag}, reply
+        elif method == 'PUT':
+            if user != userid:
+                return 403, {}, None
+            people = self._people[userid]
+            if 'biography' in data:
+                people['biography'] = data['biography'][0]
+            if 'password' in data:
+                people['password'] = data['password'][0]
+            return 200, {}, None
+        return 405, {}, None
+
+    def _query(self, entries, params):
+        if 'author' in params:
+            authors = set(params['author'])
+            entries = [x for x in entries if x['author'] in authors]
+        for text in params.get('content', ()):
+            entries = [x for x in entries if text in x['content']]
+        if 'since' in params:
+            since = params['since'][0]
+            entries = [x for x in entries if x['updated'] > since]
+        offset = int(params.get('offset', [0])[0])
+        if 'count' in params:
+            entries = entries[offset:offset + int(params['count'][0])]
+        elif offset:
+            entries = entries[offset:]
+        return entries
+
+    def _create(self, user, data):
+        author = data.get('author', [user])[0]
+        if user is None or author != user:
+            return 403, {}, None
+        fields = dict([(x, data[x][0]) for x in _entry_fields if x in data])
+        fields['contributors'] = data.get('contributors', [])
+        id_ = self._add_entry(author, fields)
+        return 201, {}, str(id_).encode('ascii')
+
+    def _entry_resource(self, method, author, id_, user, data, headers):
+        entry = self._entry_index.get((author, id_))
+        if entry is None:
+            return 404, {}, None
+        if method == 'GET':
+            updated = utils.parse_time(entry['updated'])
+            last_modified = email.utils.formatdate(updated, usegmt=True)
+            since = headers.get('If-Modified-Since')
+            if since is not None:
+                since = email.utils.parsedate_tz(since)
+                if since is not None and \
+                        email.utils.mktime_tz(since) >= updated:
+                    return 304, {'Last-Modified': last_modified}, None
+            return 200, {'Last-Modified': last_modified}, dict(entry)
+        elif user != author:
+            return 403, {}, None
+        elif method == 'PUT':
+            old, entry = entry, dict(entry)
+            for name in _entry_fields:
+                if name in data:
+                    entry[name] = data[name][0]
+            entry['contributors'] = data.get('contributors', [])
+            entry['updated'] = utils.format_time(int(time.time()))
+            self._entries[self._entries.index(old)] = entry
+            self._entry_index[(author, id_)] = entry
+            return 200, {}, dict(entry)
+        elif method == 'DELETE':
+            self._entries.remove(entry)
+            del self._entry_index[(author, id_)]
+            return 200, {}, None
+        return 405, {}, None
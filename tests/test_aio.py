@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import sys
+import json
+import unittest
+import requests
+
+import wididit
+from wididit import Server, People, Entry
+from wididit import cache
+from wididit import exceptions
+from wididit import metrics
+from wididit.follower import Scheduler, TimelineFollower
+from wididittestcase import WididitTestCase, make_reply
+from localserver import LocalServer
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from wididit import aio
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+@unittest.skipIf(sys.version_info < (3, 5), 'asyncio requires Python 3.5')
+class TestAio(WididitTestCase):
+    queries = []
+    def get(self, url, **kwargs):
+        self.queries.append(('get', url, kwargs.get('auth')))
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        if url.startswith('/people/'):
+            userid = url.split('/')[2]
+            username, hostname = userid.split('@')
+            response._content = json.dumps(
+                    {'username': username,
+                     'biography': 'biography of user %s' % userid,
+                     'server': {'hostname': hostname}})
+        elif url.startswith('/entry/'):
+            data = make_reply(1, content='the content', title='the title')
+            if len(url) == len('/entry/'):
+                data = [data, dict(data, id=2)]
+            response._content = json.dumps(data)
+        else:
+            response.status_code = requests.codes.forbidden
+        return response
+
+    def run_coroutine(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def testServer(self):
+        server = aio.AsyncServer('test.wididit.net')
+        self.assertIs(server, aio.AsyncServer('test.wididit.net'))
+        self.assertIs(server.server, Server('test.wididit.net'))
+        response = self.run_coroutine(server.get('/whoami/'))
+        self.assertEqual(response.status_code, requests.codes.forbidden)
+
+        people = People('tester', 'test.wididit.net', 'foo', connect=True)
+        connected = aio.AsyncServer('test.wididit.net', people)
+        self.assertIsNot(connected, server)
+        self.assertIs(connected.server, people.server)
+        self.assertIs(connected._sessions, server._sessions)
+
+    def testCoalesce(self):
+        server = aio.AsyncServer('test.wididit.net')
+        blocking_server = server.server
+        del self.queries[:]
+        loop = asyncio.new_event_loop()
+        try:
+            tasks = [loop.create_task(server.get('/people/%s/' % userid))
+                    for userid in ('foo@test.wididit.net',
+                        'foo@test.wididit.net', 'bar@test.wididit.net')]
+            responses = loop.run_until_complete(asyncio.gather(*tasks))
+        finally:
+            loop.close()
+        self.assertIs(responses[0], responses[1])
+        self.assertIsNot(responses[0], responses[2])
+        self.assertEqual(len(self.queries), 2)
+        self.assertEqual(blocking_server.stats['coalesced'], 1)
+
+    def testPeople(self):
+        people = People('tester', 'test.wididit.net', 'foo', connect=True)
+        self.queries = []
+        self.run_coroutine(people.async_sync())
+        self.assertEqual(self.queries, [('get',
+            '/people/tester@test.wididit.net/', ('tester', 'foo'))])
+        self.assertEqual(people.biography,
+                'biography of user tester@test.wididit.net')
+
+    def testQuery(self):
+        query = Entry.Query(Server('test.wididit.net'), Entry.Query.MODE_ALL)
+        self.queries = []
+        entries = self.run_coroutine(query.afetch(revalidate=True))
+        self.assertEqual([x.id for x in entries], [1, 2])
+        self.assertEqual(len(self.queries), 3)
+
+        iterator = query.__aiter__()
+        self.assertEqual(self.run_coroutine(iterator.__anext__()).id, 1)
+        self.assertEqual(self.run_coroutine(iterator.__anext__()).id, 2)
+        self.assertRaises(StopAsyncIteration, self.run_coroutine,
+                iterator.__anext__())
+
+        entries = self.run_coroutine(query.limit(1).afetch())
+        self.assertEqual([x.id for x in entries], [1])
+
+        # The fake server ignores the offset, and always sends both entries.
+        self.queries = []
+        entries = self.run_coroutine(query.limit(None).paginate(2).afetch())
+        self.assertEqual([x.id for x in entries], [1, 2])
+        self.assertEqual(len(self.queries), 2)
+
+    def testFollower(self):
+        query = Entry.Query(Server('test.wididit.net'), Entry.Query.MODE_ALL)
+        follower = TimelineFollower(Server('test.wididit.net'), query=query,
+                min_interval=0.01, scheduler=Scheduler(workers=1))
+        iterator = follower.__aiter__()
+        follower.start()
+        self.assertEqual(self.run_coroutine(iterator.__anext__()).id, 1)
+        self.assertEqual(self.run_coroutine(iterator.__anext__()).id, 2)
+        iterator.close()
+        follower.stop()
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not available')
+class TestAioLocalServer(WididitTestCase):
+    def setUp(self):
+        super(TestAioLocalServer, self).setUp()
+        self.local = LocalServer('local.wididit.net')
+        self.local.populate(people=2, entries=3)
+        self.local.start()
+        # The async server sends its requests to the API base of the
+        # blocking one.
+        self.blocking_server = self.local.connect(Server('local.wididit.net'))
+        self.server = aio.AsyncRealServer('local.wididit.net')
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+        self.local.stop()
+        self.blocking_server.breaker.reset()
+        super(TestAioLocalServer, self).tearDown()
+
+    def run_coroutine(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def testRequests(self):
+        self.assertIs(self.server, aio.AsyncRealServer('local.wididit.net'))
+        observer = metrics.Metrics()
+        self.blocking_server.add_observer(observer)
+        self.blocking_server.cache = cache.MemoryCache(default_ttl=60)
+        url = '/people/user0@local.wididit.net/'
+        response = self.run_coroutine(self.server.get(url))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode())['username'],
+                'user0')
+        self.assertEqual(self.run_coroutine(self.server.get(url)).content,
+                response.content)
+        self.assertEqual(list(self.server._sessions), [self.loop])
+        self.assertEqual(self.blocking_server.stats['cache_hits'], 1)
+        self.assertEqual(self.local.requests, 1)
+        response = self.run_coroutine(self.server.put(url,
+            data={'biography': 'foo'}))
+        self.assertEqual(response.status_code, 403)
+        self.run_coroutine(self.server.get(url))
+        self.assertEqual(self.local.requests, 3)
+        stats = observer.snapshot()
+        self.assertEqual(stats['GET /people/{userid}/']['count'], 3)
+        self.assertEqual(stats['PUT /people/{userid}/']['status'], {403: 1})
+
+    def testRetries(self):
+        self.blocking_server.retries = 2
+        self.blocking_server.retry_backoff = 0.001
+        self.local.stop()
+        self.assertRaises(exceptions.Unreachable, self.run_coroutine,
+                self.server.get('/whoami/'))
+        self.assertEqual(self.blocking_server.stats['retries'], 2)
+        self.assertEqual(self.blocking_server.health['failures'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
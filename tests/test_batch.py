@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+import requests
+
+from wididit import batch
+from wididit import Server, Entry
+from wididit.batch import EntryBatch
+from wididittestcase import WididitTestCase, make_reply
+
+def reply(id_, username, published):
+    return make_reply(id_, author={'username': username,
+                'server': {'hostname': 'test.wididit.net'}},
+            published='2011-12-30 15:%02i:00' % published,
+            updated='2011-12-30 16:%02i:00' % (10 - id_))
+
+class TestEntryBatch(WididitTestCase):
+    numpy = None
+    def get(self, url, **kwargs):
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        response._content = Server.serialize(self.replies)
+        return response
+
+    def setUp(self):
+        super(TestEntryBatch, self).setUp()
+        self._numpy = batch.numpy
+        batch.numpy = self.numpy
+        self.replies = [reply(1, 'foo', 3), reply(2, 'bar', 1),
+                reply(3, 'foo', 2), reply(4, 'baz', 4)]
+        self.batch = EntryBatch(self.replies)
+
+    def tearDown(self):
+        batch.numpy = self._numpy
+        super(TestEntryBatch, self).tearDown()
+
+    def ids(self, batch):
+        return [int(x) for x in batch.column('id')]
+
+    def testColumns(self):
+        self.assertEqual(len(self.batch), 4)
+        self.assertEqual(self.ids(self.batch), [1, 2, 3, 4])
+        self.assertEqual(self.batch.authors, ['foo@test.wididit.net',
+            'bar@test.wididit.net', 'baz@test.wididit.net'])
+        self.assertEqual(list(self.batch.column('author')), [0, 1, 0, 2])
+        self.assertEqual(self.batch.content(2), 'content 3')
+        self.assertEqual(self.batch.column('published').itemsize, 8)
+
+    def testEntries(self):
+        entry = self.batch[1]
+        self.assertIsInstance(entry, Entry)
+        self.assertEqual(entry.title, 'title 2')
+        self.assertEqual([x.id for x in self.batch[1:3]], [2, 3])
+        self.assertFalse(hasattr(self.batch._columns, 'replies'))
+        self.assertEqual(dict(entry.as_serializable, id=2),
+                dict(self.replies[1], author='bar@test.wididit.net'))
+
+    def testFilter(self):
+        self.assertEqual(self.ids(self.batch.filter_by_author(
+            'foo@test.wididit.net', 'baz@test.wididit.net',
+            'qux@test.wididit.net')), [1, 3, 4])
+        published = self.batch[2].published_timestamp
+        self.assertEqual(self.ids(self.batch.between(published)), [1, 3, 4])
+        self.assertEqual(self.ids(self.batch.between(
+            published_to=published)), [2, 3])
+        self.assertEqual(self.ids(self.batch.filter_by_author(
+            'foo@test.wididit.net').between(published_to=published)), [3])
+
+    def testSort(self):
+        self.assertEqual(self.ids(self.batch.sort_by('published')),
+                [2, 3, 1, 4])
+        self.assertEqual(self.ids(self.batch.sort_by('updated')),
+                [4, 3, 2, 1])
+        self.assertEqual(self.ids(self.batch.sort_by('published',
+            reverse=True).take(2)), [4, 1])
+        self.assertEqual(self.batch.sort_by('published').content(0),
+                'content 2')
+        self.replies[2]['published'] = self.replies[0]['published']
+        self.batch = EntryBatch(self.replies)
+        self.assertEqual(self.ids(self.batch.sort_by('published',
+            reverse=True)), [4, 1, 3, 2])
+
+    def testQuery(self):
+        result = Entry.Query(Server('test.wididit.net'),
+                Entry.Query.MODE_ALL).fetch_batch()
+        self.assertIsInstance(result, EntryBatch)
+        self.assertEqual(self.ids(result), [1, 2, 3, 4])
+
+@unittest.skipIf(batch.numpy is None, 'NumPy is not installed')
+class TestNumpyEntryBatch(TestEntryBatch):
+    numpy = batch.numpy
+
+if __name__ == '__main__':
+    unittest.main()
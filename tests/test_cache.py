@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+import requests
+
+from wididit import Server
+from wididit.cache import MemoryCache, DiskCache
+from wididittestcase import WididitTestCase
+
+class TestCache(WididitTestCase):
+    queries = []
+    def get(self, url, **kwargs):
+        self.queries.append(('get', url))
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        response._content = ('content of %s' % url).encode()
+        return response
+    def put(self, url, **kwargs):
+        self.queries.append(('put', url))
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        return response
+
+    def setUp(self):
+        super(TestCache, self).setUp()
+        self.queries = []
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(TestCache, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def testServer(self):
+        server = Server('test.wididit.net',
+                cache=MemoryCache(rules=[('^/people/', 60)]))
+        try:
+            for i in range(2):
+                self.assertEqual(server.get('/people/foo/').content,
+                        b'content of /people/foo/')
+                server.get('/entry/')
+            self.assertEqual(self.queries, [('get', '/people/foo/'),
+                ('get', '/entry/'), ('get', '/entry/')])
+            self.assertEqual(server.stats['cache_hits'], 1)
+            server.put('/people/foo/', data={})
+            server.get('/people/foo/')
+            self.assertEqual(self.queries[-2:], [('put', '/people/foo/'),
+                ('get', '/people/foo/')])
+        finally:
+            server.cache = None
+
+    def testKey(self):
+        key = MemoryCache.key
+        self.assertEqual(key('/entry/', {'author': ['foo']}, None),
+                key('/entry/', {'author': ['foo']}, None))
+        self.assertNotEqual(key('/entry/', {'author': ['foo']}, None),
+                key('/entry/', {'author': ['bar']}, None))
+        self.assertNotEqual(key('/entry/', None, ('foo', 'bar')),
+                key('/entry/', None, None))
+
+    def testBounds(self):
+        response = self.get('/people/foo/')
+        cache = MemoryCache(default_ttl=60, max_entries=2)
+        for key in 'abc':
+            cache.set(key, '/', response)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), None)
+        cache = MemoryCache(default_ttl=60, max_bytes=50)
+        for key in 'abc':
+            cache.set(key, '/', response)
+        self.assertEqual(len(cache), 2)
+        cache = MemoryCache(default_ttl=0.01)
+        cache.set('a', '/', response)
+        time.sleep(0.02)
+        self.assertEqual(cache.get('a'), None)
+
+    def testInvalidate(self):
+        cache = MemoryCache(default_ttl=60)
+        for path in ('/entry/', '/entry/timeline/', '/entry/foo@bar/1/',
+                '/people/foo@bar/'):
+            cache.set(path, path, self.get(path))
+        cache.invalidate('/entry/foo@bar/2/')
+        self.assertEqual(len(cache), 1)
+        self.assertNotEqual(cache.get('/people/foo@bar/'), None)
+
+    def testDisk(self):
+        cache = DiskCache(self.directory, default_ttl=60)
+        cache.set('a', '/people/foo/', self.get('/people/foo/'))
+        cache = DiskCache(self.directory, default_ttl=60)
+        self.assertEqual(cache.get('a').content, b'content of /people/foo/')
+        with open(os.path.join(self.directory, 'a.cache'), 'rb') as fd:
+            self.assertEqual(json.loads(fd.read().decode('utf8'))['path'],
+                    '/people/foo/')
+        cache.invalidate('/people/foo/')
+        cache = DiskCache(self.directory, default_ttl=60)
+        self.assertEqual(len(cache), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,19 +20,24 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import io
 import sys
 import json
+import time
 import unittest
 import requests
+import threading
 
 import wididit
+from wididit import utils
 from wididit import exceptions
 from wididit import Server, People, Entry
-from wididittestcase import WididitTestCase
+from wididittestcase import WididitTestCase, make_reply
 
 class TestPeople(WididitTestCase):
     queries = []
     def get(self, url, **kwargs):
+        self.queries.append(('get', url))
         response = requests.Response()
         if url.startswith('/people/'):
             userid = url.split('/')[2]
@@ -68,8 +73,8 @@ class TestPeople(WididitTestCase):
             response.status_code = requests.codes.ok
             if len(url) == len('/entry/'):
                 data = [data]
-            if 'data' in kwargs and 'author' in kwargs['data']:
-                if 'tester@test.wididit.net' not in kwargs['data']['author']:
+            if 'params' in kwargs and 'author' in kwargs['params']:
+                if 'tester@test.wididit.net' not in kwargs['params']['author']:
                     data = []
             response._content = Server.serialize(data)
         else:
@@ -85,12 +90,86 @@ class TestPeople(WididitTestCase):
             response._content = '1'
         return response
 
+    def put(self, url, data, **kwargs):
+        self.queries.append(('put', url, data))
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        if self.put_reply is not None:
+            response._content = Server.serialize(self.put_reply)
+        return response
+    put_reply = None
+
+    def testEdit(self):
+        entry = Entry('tester@test.wididit.net', 1)
+        self.queries = []
+        entry.title = 'new title'
+        self.assertEqual([x[:2] for x in self.queries], [
+            ('put', '/entry/tester@test.wididit.net/1/'),
+            ('get', '/entry/tester@test.wididit.net/1/')])
+        self.assertEqual(self.queries[0][2]['title'], 'new title')
+        self.assertEqual(entry.title, 'new title')
+
+        self.queries = []
+        self.put_reply = {'updated': '2011-12-30 16:00:00'}
+        with entry.editing():
+            entry.content = 'new content'
+            entry.summary = 'new summary'
+            self.assertEqual(entry.content, 'new content')
+            self.assertEqual(self.queries, [])
+        self.assertEqual([x[:2] for x in self.queries], [
+            ('put', '/entry/tester@test.wididit.net/1/')])
+        self.assertEqual(self.queries[0][2]['content'], 'new content')
+        self.assertEqual(self.queries[0][2]['summary'], 'new summary')
+        self.assertEqual(self.queries[0][2]['title'], 'new title')
+        self.assertEqual(entry.updated[3], 16)
+
+        self.queries = []
+        entry.update(category='foo', rights='bar')
+        self.assertEqual(len(self.queries), 1)
+        self.assertEqual(entry.rights, 'bar')
+        self.assertRaises(AttributeError, entry.update, author='foo')
+        self.assertRaises(ValueError, entry.update, title=42)
+
+        self.queries = []
+        try:
+            with entry.editing():
+                entry.title = 'discarded'
+                raise KeyError()
+        except KeyError:
+            pass
+        self.assertEqual(self.queries, [])
+        self.assertEqual(entry.title, 'new title')
+
+    def testEditThreads(self):
+        entry = Entry('tester@test.wididit.net', 1)
+        entry.title = 'committed title'
+        self.queries = []
+        seen = []
+        def other_thread():
+            seen.append(entry.title)
+            entry.summary = 'other summary'
+        try:
+            with entry.editing():
+                entry.title = 'discarded'
+                thread = threading.Thread(target=other_thread)
+                thread.start()
+                thread.join()
+                raise KeyError()
+        except KeyError:
+            pass
+        self.assertEqual(seen, ['committed title'])
+        self.assertEqual(len([x for x in self.queries if x[0] == 'put']), 1)
+        self.assertEqual(self.queries[0][2]['title'], 'committed title')
+        self.assertEqual(self.queries[0][2]['summary'], 'other summary')
+        self.assertEqual(entry.title, 'committed title')
+        self.assertEqual(entry.summary, 'other summary')
+
     def testCreation(self):
         tester = wididit.People('tester', 'test.wididit.net', 'password',
                 connect=True)
+        self.queries = []
         entry = Entry(tester, title='my title', content='my content')
-        self.assertEqual(len(self.queries), 1)
-        query = self.queries.pop()
+        query = self.queries.pop(0)
         self.assertEqual(query[0], 'post')
         self.assertEqual(query[1], 'entry')
         self.assertEqual(query[2]['content'], 'my content')
@@ -102,9 +181,18 @@ class TestPeople(WididitTestCase):
     def testGet(self):
         entry = Entry('tester@test.wididit.net', 1)
         self.assertEqual(entry.content, 'the content')
+        self.assertEqual(entry.updated_timestamp, 1325260505)
+        self.assertEqual(entry.updated[:6], (2011, 12, 30, 15, 55, 5))
+        self.assertEqual(entry.contributors, [])
+        self.assertFalse(hasattr(entry, '__dict__'))
         tester = People('tester', 'test.wididit.net')
         self.assertEqual(entry.author, tester)
 
+    def testRevalidation(self):
+        entry = Entry('tester@test.wididit.net', 1)
+        self.assertEqual(entry._conditional_headers(),
+                {'If-Modified-Since': 'Fri, 30 Dec 2011 15:55:05 GMT'})
+
     def testQuery(self):
         server = wididit.Server('test.wididit.net')
         tester = wididit.People('tester', 'test.wididit.net')
@@ -117,6 +205,201 @@ class TestPeople(WididitTestCase):
         self.assertEqual(len(Entry.Query(server, Entry.Query.MODE_ALL) \
                 .filterAuthor(tester2).fetch()), 0)
 
+    def testQueryHydration(self):
+        server = wididit.Server('test.wididit.net')
+        self.queries = []
+        entries = Entry.Query(server, Entry.Query.MODE_ALL).fetch()
+        self.assertEqual(self.queries, [('get', '/entry/')])
+        self.assertEqual(entries[0].title, 'the title')
+        self.assertEqual(entries[0].author.userid, 'tester@test.wididit.net')
+        self.assertIs(entries[0], Entry('tester@test.wididit.net', 1))
+
+        self.queries = []
+        entries = Entry.Query(server, Entry.Query.MODE_ALL) \
+                .fetch(revalidate=True)
+        self.assertEqual(self.queries, [('get', '/entry/'),
+            ('get', '/entry/tester@test.wididit.net/1/')])
+
+class TestQuery(WididitTestCase):
+    queries = []
+    def get(self, url, params={}, **kwargs):
+        self.queries.append(dict(params))
+        entries = [make_reply(id_, updated='2011-12-30 15:%02i:00' % id_)
+                for id_ in range(1, 11)]
+        if 'since' in params:
+            entries = [x for x in entries if x['updated'] > params['since']]
+        if 'offset' in params and 'offset' not in self.ignored:
+            entries = entries[params['offset']:]
+        if 'count' in params and 'count' not in self.ignored:
+            entries = entries[:params['count']]
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        response._content = Server.serialize(entries)
+        if kwargs.get('stream'):
+            content = response._content
+            if not isinstance(content, bytes):
+                content = content.encode('utf8')
+            response.raw = io.BytesIO(content)
+            response._content = False
+            self.streams.append(response.raw)
+        return response
+
+    def setUp(self):
+        super(TestQuery, self).setUp()
+        self.queries = []
+        self.streams = []
+        self.ignored = ()
+        self.query = Entry.Query(Server('test.wididit.net'),
+                Entry.Query.MODE_ALL)
+
+    def testFetch(self):
+        self.assertEqual([x.id for x in self.query], list(range(1, 11)))
+        self.assertEqual(self.queries, [{}])
+
+    def testPaginate(self):
+        self.assertEqual([x.id for x in self.query.paginate(4)],
+                list(range(1, 11)))
+        self.assertEqual(self.queries, [
+            {'offset': 0, 'count': 4},
+            {'offset': 4, 'count': 4},
+            {'offset': 8, 'count': 4}])
+
+    def testPrefetch(self):
+        iterator = iter(self.query.paginate(4))
+        self.assertEqual([next(iterator).id, next(iterator).id], [1, 2])
+        self.assertEqual(len(self.queries), 1)
+        iterator.close()
+
+    def testIgnoredPagination(self):
+        self.ignored = ('count', 'offset')
+        self.assertEqual([x.id for x in self.query.paginate(4)],
+                list(range(1, 11)))
+        self.assertEqual(len(self.queries), 1)
+        self.queries = []
+        self.ignored = ('offset',)
+        self.assertEqual([x.id for x in self.query.paginate(4)],
+                [1, 2, 3, 4])
+        self.assertEqual(len(self.queries), 2)
+        self.queries = []
+        self.assertEqual([x.id for x in self.query.paginate(4).stream(64)],
+                [1, 2, 3, 4])
+        self.assertEqual(len(self.queries), 2)
+
+    def testLimit(self):
+        iterator = iter(self.query.paginate(4).limit(6))
+        self.assertEqual(next(iterator).id, 1)
+        self.assertEqual([x.id for x in iterator], list(range(2, 7)))
+        self.assertEqual(self.queries, [
+            {'offset': 0, 'count': 4},
+            {'offset': 4, 'count': 2}])
+
+    def testStream(self):
+        iterator = iter(self.query.paginate(4).stream(64))
+        self.assertEqual(next(iterator).id, 1)
+        stream = self.streams[0]
+        self.assertTrue(stream.tell() < len(stream.getvalue()))
+        self.assertEqual([x.id for x in iterator], list(range(2, 11)))
+        self.assertEqual(self.queries, [
+            {'offset': 0, 'count': 4},
+            {'offset': 4, 'count': 4},
+            {'offset': 8, 'count': 4}])
+        self.assertTrue(all(x.closed for x in self.streams))
+
+        self.queries = []
+        self.streams = []
+        entries = self.query.paginate(None).limit(3).fetch()
+        self.assertEqual([x.id for x in entries], [1, 2, 3])
+        self.assertTrue(all(x.closed for x in self.streams))
+        self.assertEqual([x.id for x in self.query.fetch_batch()], [1, 2, 3])
+
+    def testSince(self):
+        entries = self.query.since('2011-12-30 15:07:00').fetch()
+        self.assertEqual([x.id for x in entries], [8, 9, 10])
+        self.assertEqual(self.queries, [{'since': '2011-12-30 15:07:00'}])
+
+class TestCreateMany(WididitTestCase):
+    queries = []
+    def post(self, url, data, **kwargs):
+        self.queries.append(('post', url, data['title']))
+        response = requests.Response()
+        if data['title'] == 'fail':
+            response.status_code = requests.codes.internal_server_error
+        else:
+            response.status_code = requests.codes.created
+            response._content = data['title'].encode()
+        return response
+    def get(self, url, headers={}, **kwargs):
+        self.queries.append(('get', url, headers.get('If-Modified-Since')))
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        response._content = json.dumps(make_reply(1, title='1',
+            generator='Wididit python library'))
+        return response
+
+    def testCreateMany(self):
+        tester = People('tester', 'test.wididit.net', 'password',
+                connect=True)
+        results = Entry.create_many(tester, ({'title': str(x),
+            'content': 'content %i' % x} for x in (1, 2, 3)), concurrency=2)
+        results = list(results)
+        self.assertEqual([x.id for x in results], [1, 2, 3])
+        self.assertEqual(results[2].content, 'content 3')
+        self.assertEqual(results[2].generator, 'Wididit python library')
+        self.assertEqual(sorted(self.queries), [('post', '/entry/', '1'),
+            ('post', '/entry/', '2'), ('post', '/entry/', '3')])
+        # Times are only known by the server.
+        self.assertEqual(results[0].updated_timestamp,
+                utils.parse_time('2011-12-30 15:55:05'))
+        self.assertEqual(self.queries[-1],
+                ('get', '/entry/tester@test.wididit.net/1/', None))
+        self.assertIs(results[0], Entry.from_reply(
+            dict(results[0].as_serializable, id=1)))
+
+        results = list(Entry.create_many(tester,
+            [{'title': '4'}, {'title': 'fail'}, {'title': '5'}, {}]))
+        self.assertEqual(results[0].id, 4)
+        self.assertIsInstance(results[1], exceptions.ServerException)
+        self.assertEqual(results[2].id, 5)
+        self.assertIsInstance(results[3], KeyError)
+
+class TestFederatedQuery(WididitTestCase):
+    newest_first = True
+    def get(self, url, params={}, **kwargs):
+        entries = []
+        for userid in params['author']:
+            if userid.endswith('@slow.wididit.net'):
+                time.sleep(0.5)
+            hostname = userid.split('@')[1]
+            minutes = {'test.wididit.net': (1, 4, 6),
+                    'test2.wididit.net': (2, 3, 5),
+                    'slow.wididit.net': (7,)}[hostname]
+            entries.extend([make_reply(minute, author=userid,
+                    published='2011-12-30 15:00:00',
+                    updated='2011-12-30 15:%02i:00' % minute)
+                for minute in minutes])
+        entries.sort(key=lambda x:x['updated'], reverse=self.newest_first)
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        response._content = Server.serialize(entries)
+        return response
+
+    def testMerge(self):
+        query = Entry.FederatedQuery(['tester@test.wididit.net',
+            'tester@test2.wididit.net'])
+        self.assertEqual([x.id for x in query], [6, 5, 4, 3, 2, 1])
+        self.newest_first = False
+        query = Entry.FederatedQuery(['tester@test.wididit.net',
+            'tester@test2.wididit.net'], newest_first=False).limit(3)
+        self.assertEqual([(x.author.server.hostname, x.id) for x in query], [
+            ('test.wididit.net', 1), ('test2.wididit.net', 2),
+            ('test2.wididit.net', 3)])
+
+    def testDeadline(self):
+        query = Entry.FederatedQuery(['tester@test.wididit.net',
+            'tester@slow.wididit.net'], deadline=0.1)
+        self.assertEqual([x.id for x in query.fetch()], [6, 4, 1])
+        self.assertEqual(query.timed_out, ['slow.wididit.net'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import time
+import unittest
+import requests
+
+from wididit import Server, Entry
+from wididit.follower import Scheduler, TimelineFollower
+from wididittestcase import WididitTestCase, make_reply
+
+def reply(id_, second):
+    return make_reply(id_, published='2011-12-30 15:00:00',
+            updated='2011-12-30 15:00:%02i' % second)
+
+class TestTimelineFollower(WididitTestCase):
+    def get(self, url, params={}, **kwargs):
+        self.queries.append(params.get('since'))
+        entries = self.entries
+        if 'since' in params:
+            entries = [x for x in entries if x['updated'] > params['since']]
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        response._content = Server.serialize(entries)
+        if self.broken:
+            response._content = b'not JSON'
+        return response
+
+    def setUp(self):
+        super(TestTimelineFollower, self).setUp()
+        self.queries = []
+        self.broken = False
+        self.entries = [reply(1, 1), reply(2, 2)]
+        self.server = Server('test.wididit.net')
+        self.query = Entry.Query(self.server, Entry.Query.MODE_ALL)
+
+    def testPoll(self):
+        follower = TimelineFollower(self.server, query=self.query,
+                min_interval=1, max_interval=3)
+        self.assertEqual([x.id for x in follower.poll()], [1, 2])
+        self.assertEqual(follower.cursor, 1325257202)
+        self.assertEqual(follower.poll(), [])
+        self.assertEqual(follower.interval, 2)
+        self.entries.append(reply(3, 2))
+        self.entries.append(reply(1, 3))
+        entries = follower.poll()
+        self.assertEqual([x.id for x in entries], [3, 1])
+        self.assertIs(entries[1], Entry.from_reply(reply(1, 3)))
+        self.assertEqual(follower.interval, 1)
+        follower.poll()
+        follower.poll()
+        follower.poll()
+        self.assertEqual(follower.interval, 3)
+        self.assertEqual(self.queries, [None, '2011-12-30 15:00:01',
+            '2011-12-30 15:00:01', '2011-12-30 15:00:02',
+            '2011-12-30 15:00:02', '2011-12-30 15:00:02'])
+        self.assertEqual(len(self.query.fetch()), 4)
+
+    def testScheduler(self):
+        scheduler = Scheduler(workers=2)
+        received = []
+        followers = [TimelineFollower(self.server, received.extend,
+            query=Entry.Query(self.server, Entry.Query.MODE_ALL),
+            min_interval=0.01, max_interval=0.02, scheduler=scheduler)
+            for x in range(3)]
+        iterator = iter(followers[0])
+        for follower in followers:
+            follower.start()
+        self.assertEqual([next(iterator).id, next(iterator).id], [1, 2])
+        self.entries.append(reply(3, 3))
+        self.assertEqual(next(iterator).id, 3)
+        deadline = time.time() + 5
+        while len(received) < 9 and time.time() < deadline:
+            time.sleep(0.01)
+        for follower in followers:
+            follower.stop()
+        time.sleep(0.05)
+        self.assertEqual(sorted([x.id for x in received]), [1, 1, 1, 2, 2, 2,
+            3, 3, 3])
+        self.assertEqual(len(scheduler), 0)
+
+    def testErrors(self):
+        scheduler = Scheduler(workers=1)
+        def fail(entries):
+            raise KeyError()
+        received = []
+        follower = TimelineFollower(self.server, fail, query=self.query,
+                min_interval=0.01, max_interval=0.01, scheduler=scheduler)
+        follower.add_callback(received.extend)
+        self.broken = True
+        follower.start()
+        deadline = time.time() + 5
+        while len(self.queries) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertIsInstance(follower.error, ValueError)
+        self.broken = False
+        while not isinstance(follower.error, KeyError) and \
+                time.time() < deadline:
+            time.sleep(0.01)
+        follower.stop()
+        self.assertEqual([x.id for x in received], [1, 2])
+        self.assertIsInstance(follower.error, KeyError)
+
+        # Tasks raising exceptions do not stop workers.
+        calls = []
+        scheduler.schedule(lambda:calls.append(1) + 1, 0)
+        scheduler.schedule(lambda:calls.append(2), 0.01)
+        while len(calls) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(calls, [1, 2])
+        self.assertIsInstance(scheduler.error, TypeError)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import shutil
+import unittest
+import tempfile
+
+from wididit import Server, Entry
+from wididit.index import EntryIndex
+from wididittestcase import WididitTestCase, make_reply
+
+def reply(id_, author, content, minute):
+    return make_reply(id_, author='%s@test.wididit.net' % author,
+            content=content, published='2011-12-30 15:00:00',
+            updated='2011-12-30 15:%02i:00' % minute)
+
+class TestEntryIndex(WididitTestCase):
+    def setUp(self):
+        super(TestEntryIndex, self).setUp()
+        self.index = EntryIndex()
+        self.index.add([
+            reply(1, 'foo', 'Hello world #spam', 1),
+            reply(2, 'bar', 'hello #spam#egg and #wididit', 2),
+            reply(3, 'foo', 'nothing to see', 3),
+            ])
+
+    def testSearch(self):
+        index = self.index
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.search(), ['foo@test.wididit.net/3',
+            'bar@test.wididit.net/2', 'foo@test.wididit.net/1'])
+        self.assertEqual(index.search(content=['HELLO']),
+                ['bar@test.wididit.net/2', 'foo@test.wididit.net/1'])
+        self.assertEqual(index.search(content=['hello', 'world']),
+                ['foo@test.wididit.net/1'])
+        self.assertEqual(index.search(content=['hello world', 'and']), [])
+        self.assertEqual(index.search(content=['hello'], limit=1),
+                ['bar@test.wididit.net/2'])
+        self.assertEqual(index.search(content=['hello'],
+            since=1325257260), ['bar@test.wididit.net/2'])
+        self.assertEqual(index.search(authors=['foo@test.wididit.net',
+            'bar@test.wididit.net'], content=['see']),
+            ['foo@test.wididit.net/3'])
+        query = Entry.Query(Server('test.wididit.net'), Entry.Query.MODE_ALL)
+        query.filterAuthor('bar@test.wididit.net').filterContent('hello')
+        self.assertEqual(index.search_query(query), ['bar@test.wididit.net/2'])
+
+    def testTags(self):
+        index = self.index
+        self.assertEqual(index.search(tags=['#spam']),
+                ['bar@test.wididit.net/2', 'foo@test.wididit.net/1'])
+        self.assertEqual(index.search(tags=['#spam#egg']),
+                ['bar@test.wididit.net/2'])
+        self.assertEqual(index.search(tags=['#egg']), [])
+        self.assertEqual(index.tags(), {'#spam': 2, '#spam#egg': 1,
+            '#wididit': 1})
+        self.assertEqual(index.tags('#spam'), {'#spam#egg': 1})
+
+    def testUpdate(self):
+        index = self.index
+        index.add([reply(1, 'foo', 'Goodbye #egg', 4)])
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.search(content=['hello']),
+                ['bar@test.wididit.net/2'])
+        self.assertEqual(index.search(tags=['#egg']),
+                ['foo@test.wididit.net/1'])
+        index.remove('bar@test.wididit.net/2')
+        self.assertNotIn('bar@test.wididit.net/2', index)
+        self.assertEqual(index.search(content=['hello']), [])
+        self.assertEqual(index.tags(), {'#egg': 1})
+
+    def testPersistence(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'index')
+            self.index.save(path)
+            index = EntryIndex.load(path)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(index.search(tags=['#spam'], content=['world']),
+                ['foo@test.wididit.net/1'])
+        self.assertEqual(index.tags('#spam'), self.index.tags('#spam'))
+        index.remove('foo@test.wididit.net/1')
+        self.assertEqual(len(index), 2)
+
+if __name__ == '__main__':
+    unittest.main()
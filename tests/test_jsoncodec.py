@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import json
+import unittest
+
+from wididit import jsoncodec
+
+class TestRegistry(unittest.TestCase):
+    def tearDown(self):
+        jsoncodec.set_default(None)
+
+    def testDefault(self):
+        calls = []
+        jsoncodec.register('lazy', lambda:calls.append('lazy'))
+        self.addCleanup(jsoncodec.unregister, 'lazy')
+        jsoncodec.set_default(None)
+        self.assertIs(jsoncodec.get_codec(), jsoncodec.get_default())
+        self.assertEqual(calls, [])
+        self.assertIn(jsoncodec.get_default().name, jsoncodec.available())
+
+        jsoncodec.register('test', lambda:jsoncodec.Codec('test', None, None))
+        jsoncodec.set_default('test')
+        self.assertEqual(jsoncodec.get_default().name, 'test')
+        jsoncodec.unregister('test')
+        self.assertNotEqual(jsoncodec.get_default().name, 'test')
+        self.assertRaises(KeyError, jsoncodec.get_codec, 'test')
+
+class TestIterArray(unittest.TestCase):
+    def testChunks(self):
+        data = [{'content': u'h\xe9llo, [world]', 'id': 12345}, 123,
+                [1, {'x': ']'}], 's,]', None, 1.5e3, True]
+        content = json.dumps(data, ensure_ascii=False).encode('utf8')
+        for size in (1, 2, 3, 7, len(content)):
+            chunks = [content[i:i+size] for i in range(0, len(content), size)]
+            self.assertEqual(list(jsoncodec.iter_array(chunks)), data)
+        self.assertEqual(list(jsoncodec.iter_array([' [ ', ' ]'])), [])
+
+    def testIncremental(self):
+        chunks = iter([b'[{"id": 1}, {"id"', b': 2}]'])
+        iterator = jsoncodec.iter_array(chunks)
+        self.assertEqual(next(iterator), {'id': 1})
+        self.assertEqual(next(chunks), b': 2}]')
+
+    def testInvalid(self):
+        for content in (b'', b'{}', b'[1', b'[1,]', b'[1 2]', b'[1, 2'):
+            self.assertRaises(ValueError, list,
+                    jsoncodec.iter_array([content]))
+
+if __name__ == '__main__':
+    unittest.main()
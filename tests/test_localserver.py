@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+
+from wididit import People, Entry
+from wididit.server import RealServer
+from localserver import LocalServer
+from wididittestcase import WididitTestCase
+
+class TestLocalServer(WididitTestCase):
+    def setUp(self):
+        super(TestLocalServer, self).setUp()
+        self.local = LocalServer('local.wididit.net')
+        self.local.populate(people=2, entries=3, content_size=100)
+        self.local.start()
+        self.server = self.local.connect(RealServer('local.wididit.net'))
+
+    def tearDown(self):
+        self.server.close()
+        self.local.stop()
+        super(TestLocalServer, self).tearDown()
+
+    def testPeople(self):
+        self.assertEqual(self.server.whoami, None)
+        server = RealServer('local.wididit.net',
+                People('user1', 'local.wididit.net', 'password'))
+        self.assertEqual(server.whoami, 'user1@local.wididit.net')
+        response = server.get('/people/user0@local.wididit.net/')
+        self.assertEqual(server.unserialize(response.content),
+                {'username': 'user0', 'biography': 'Biography of user 0.',
+                 'server': {'hostname': 'local.wididit.net'}})
+        response = server.get('/people/user0@local.wididit.net/',
+                headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        response = server.put('/people/user0@local.wididit.net/',
+                data={'biography': 'foo'})
+        self.assertEqual(response.status_code, 403)
+
+    def testEntries(self):
+        query = Entry.Query(self.server, Entry.Query.MODE_ALL)
+        entries = query.paginate(4).fetch()
+        self.assertEqual([x.entryid for x in entries][:4], [
+            'user0@local.wididit.net/1', 'user0@local.wididit.net/2',
+            'user0@local.wididit.net/3', 'user1@local.wididit.net/1'])
+        self.assertEqual(len(entries), 6)
+        self.assertEqual(len(entries[0].content), 100)
+        query = Entry.Query(self.server, Entry.Query.MODE_ALL)
+        query.filterAuthor('user1@local.wididit.net').filterContent('#tag2')
+        self.assertEqual([x.entryid for x in query.fetch()],
+                ['user1@local.wididit.net/3'])
+        self.assertEqual(self.local.requests, 3)
+
+        server = RealServer('local.wididit.net',
+                People('user1', 'local.wididit.net', 'password'))
+        response = server.post('/entry/', data={'title': 'new',
+            'content': 'new entry', 'author': 'user1@local.wididit.net'})
+        self.assertEqual((response.status_code, response.content),
+                (201, b'4'))
+        response = server.put('/entry/user1@local.wididit.net/4/',
+                data={'title': 'edited', 'contributors': ['foo@bar']})
+        self.assertEqual(server.unserialize(response.content)['title'],
+                'edited')
+        response = server.get('/entry/user1@local.wididit.net/4/')
+        self.assertEqual(server.unserialize(response.content)
+                ['contributors'], ['foo@bar'])
+        self.assertEqual(server.get('/entry/user1@local.wididit.net/4/',
+            headers={'If-Modified-Since': response.headers['Last-Modified']})
+            .status_code, 304)
+        self.assertEqual(server.get('/entry/timeline/').status_code, 200)
+
+    def testErrors(self):
+        self.local.error_rate = 1
+        self.assertEqual(self.server.get('/entry/').status_code, 503)
+        self.local.error_rate = 0
+        self.assertEqual(self.server.get('/entry/').status_code, 200)
+        self.assertEqual(self.server.get('/nowhere/').status_code, 404)
+        self.assertEqual(self.server.get('/entry/timeline/').status_code, 403)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+import requests
+
+from wididit import Server, exceptions
+from wididit.cache import MemoryCache
+from wididit.metrics import Metrics, RequestObserver, path_template
+from wididittestcase import WididitTestCase
+
+class Recorder(RequestObserver):
+    def __init__(self):
+        self.events = []
+    def request_started(self, event):
+        self.events.append(('started', event.method, event.template))
+    def request_finished(self, event):
+        self.events.append(('finished', event.method, event.template,
+            event.status, event.bytes, event.cache, event.revalidated,
+            type(event.error).__name__ if event.error else None))
+
+class TestMetrics(WididitTestCase):
+    def response(self, status, content=b''):
+        response = requests.Response()
+        response.status_code = status
+        response._content = content
+        return response
+
+    def get(self, url, **kwargs):
+        if url.startswith('/people/'):
+            return self.response(requests.codes.not_modified)
+        elif url == '/down/':
+            raise requests.exceptions.ConnectionError()
+        return self.response(requests.codes.ok, b'[1, 2]')
+
+    def put(self, url, **kwargs):
+        return self.response(requests.codes.ok, b'{}')
+
+    def testPathTemplate(self):
+        self.assertEqual(path_template('/entry/foo@example.com/42/'),
+                '/entry/{userid}/{id}/')
+        self.assertEqual(path_template('/people/foo@example.com/'),
+                '/people/{userid}/')
+        self.assertEqual(path_template('/entry/timeline/'),
+                '/entry/timeline/')
+
+    def testObserver(self):
+        server = Server('test.wididit.net')
+        recorder = Recorder()
+        server.add_observer(recorder)
+        server.get('/entry/')
+        server.get('/people/foo@test.wididit.net/')
+        server.put('/entry/foo@test.wididit.net/1/')
+        self.assertRaises(exceptions.Unreachable, server.get, '/down/')
+        server.remove_observer(recorder)
+        server.get('/entry/')
+        self.assertEqual(recorder.events, [
+            ('started', 'GET', '/entry/'),
+            ('finished', 'GET', '/entry/', 200, 6, None, False, None),
+            ('started', 'GET', '/people/{userid}/'),
+            ('finished', 'GET', '/people/{userid}/', 304, 0, None, True,
+                None),
+            ('started', 'PUT', '/entry/{userid}/{id}/'),
+            ('finished', 'PUT', '/entry/{userid}/{id}/', 200, 2, None, False,
+                None),
+            ('started', 'GET', '/down/'),
+            ('finished', 'GET', '/down/', None, None, None, False,
+                'ConnectionError'),
+            ])
+
+    def testCache(self):
+        server = Server('test.wididit.net', cache=MemoryCache(default_ttl=60))
+        recorder = Recorder()
+        server.add_observer(recorder)
+        server.get('/entry/')
+        server.get('/entry/')
+        self.assertEqual([x[5] for x in recorder.events[1::2]],
+                ['miss', 'hit'])
+
+    def testSnapshot(self):
+        server = Server('test.wididit.net')
+        metrics = Metrics(buckets=[1, 60])
+        server.add_observer(metrics)
+        for x in range(3):
+            server.get('/entry/')
+        server.get('/people/foo@test.wididit.net/')
+        self.assertRaises(exceptions.Unreachable, server.get, '/down/')
+        snapshot = metrics.snapshot(reset=True)
+        self.assertEqual(sorted(snapshot), ['GET /down/', 'GET /entry/',
+            'GET /people/{userid}/'])
+        entries = snapshot['GET /entry/']
+        self.assertEqual(entries['count'], 3)
+        self.assertEqual(entries['status'], {200: 3})
+        self.assertEqual(entries['bytes'], 18)
+        self.assertEqual([x[0] for x in entries['duration']['buckets']],
+                [1, 60, None])
+        self.assertEqual(entries['duration']['buckets'][0][1], 3)
+        self.assertTrue(entries['duration']['p99'] <=
+                entries['duration']['max'])
+        self.assertEqual(snapshot['GET /people/{userid}/']['revalidated'], 1)
+        self.assertEqual(snapshot['GET /down/']['errors'], 1)
+        self.assertEqual(metrics.snapshot(), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,11 +33,16 @@ from wididittestcase import WididitTestCase
 class TestPeople(WididitTestCase):
     queries = []
     def get(self, url, **kwargs):
+        self.queries.append(('get', url))
         response = requests.Response()
-        if url.startswith('/people/'):
+        if url.startswith('/people/') and \
+                kwargs.get('headers', {}).get('If-None-Match') == '"v1"':
+            response.status_code = requests.codes.not_modified
+        elif url.startswith('/people/'):
             userid = url.split('/')[2]
             username, hostname = userid.split('@')
             response.status_code = requests.codes.ok
+            response.headers['ETag'] = '"v1"'
             response._content = json.dumps(
                     {'username': username,
                      'biography': 'biography of user %s' % userid,
@@ -46,6 +51,7 @@ class TestPeople(WididitTestCase):
             response.status_code = requests.codes.forbidden
         return response
     def put(self, url, data, headers={}, **kwargs):
+        self.auth = kwargs.get('auth')
         response = requests.Response()
         if 'auth' not in kwargs or kwargs['auth'] is None:
             response.status_code = requests.codes.forbidden
@@ -65,6 +71,55 @@ class TestPeople(WididitTestCase):
         self.assertEqual(people, people2)
         self.assertNotEqual(people, people3)
         self.assertNotEqual(people, people4)
+        self.assertIs(people, people2)
+        self.assertIs(people.server, Server('test.wididit.net'))
+
+    def testLazySync(self):
+        self.queries = []
+        people = People.from_anything('tester@test.wididit.net')
+        self.assertEqual(self.queries, [])
+        self.assertEqual(people.biography,
+                'biography of user tester@test.wididit.net')
+        self.assertEqual(people.biography,
+                'biography of user tester@test.wididit.net')
+        self.assertEqual(self.queries,
+                [('get', '/people/tester@test.wididit.net/')])
+
+    def testRevalidation(self):
+        people = People('tester', 'test.wididit.net')
+        people.sync()
+        self.assertEqual(people.server.stats['revalidated'], 0)
+        people._biography = 'foo'
+        people.sync()
+        self.assertEqual(people.server.stats['revalidated'], 1)
+        self.assertEqual(people.biography, 'foo')
+
+    def testSingleton(self):
+        people = People('tester', 'test.wididit.net', 'foo', connect=True)
+        self.assertIs(People('tester', 'test.wididit.net'), people)
+        self.assertEqual(people.password, 'foo')
+
+    def testConnections(self):
+        alice = People('alice', 'test.wididit.net', 'pa', connect=True)
+        bob = People('bob', 'test.wididit.net', 'pb', connect=True)
+        carol = People('carol', 'test.wididit.net')
+        self.assertIs(alice.server.connected_as, alice)
+        self.assertIs(bob.server.connected_as, bob)
+        self.assertIs(carol.server.connected_as, None)
+        self.assertIs(People('alice', 'test.wididit.net').server,
+                alice.server)
+        alice.biography = 'foo'
+        self.assertEqual(self.auth, ('alice', 'pa'))
+        bob.biography = 'bar'
+        self.assertEqual(self.auth, ('bob', 'pb'))
+        self.assertRaises(exceptions.Forbidden, setattr,
+                carol, 'biography', 'baz')
+        self.assertEqual(self.auth, None)
+
+        # Everything but the user is shared by the servers of a hostname.
+        Server('test.wididit.net', retries=3)
+        self.assertEqual(alice.server.retries, 3)
+        self.assertIs(bob.server.stats, carol.server.stats)
 
     def testBiography(self):
         people = People('tester', 'test.wididit.net', 'foo', connect=True)
@@ -20,16 +20,43 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import gc
 import unittest
+import time
+import threading
 import sys
+import requests
 
 import wididit
 from wididit import Server
+from wididit import breaker
+from wididit import exceptions
+from wididit import jsoncodec
+from wididit import metrics
+from wididit.wididitobject import WididitObject
 from wididittestcase import WididitTestCase
 
 class TestServer(WididitTestCase):
+    down = 0
     def get(self, url, **kwargs):
+        self.calls.append(url)
+        if self.down:
+            self.down -= 1
+            raise requests.exceptions.ConnectionError()
         return '->%s<-' % url
+    post = get
+
+    def setUp(self):
+        super(TestServer, self).setUp()
+        self.calls = []
+        self.down = 0
+
+    def tearDown(self):
+        breaker_ = Server('test.wididit.net').breaker
+        breaker_.reset()
+        breaker_.threshold = Server.breaker_threshold
+        breaker_.recovery_time = Server.breaker_recovery_time
+        super(TestServer, self).tearDown()
 
     def testBasics(self):
         server = Server('test.wididit.net')
@@ -41,6 +68,162 @@ class TestServer(WididitTestCase):
         self.assertEqual(server, server2)
         self.assertNotEqual(server, server3)
 
+    def testLifetime(self):
+        observer = metrics.Metrics()
+        server = Server('test.wididit.net', retries=3)
+        server.add_observer(observer)
+        server._count('foo')
+        del server
+        gc.collect()
+        server = Server('test.wididit.net')
+        self.assertEqual(server.retries, 3)
+        self.assertEqual(server._observers, [observer])
+        self.assertEqual(server.stats['foo'], 1)
+
+    def testSession(self):
+        server = Server('test.wididit.net')
+        server2 = Server('test.wididit.net')
+        server3 = Server('test2.wididit.net')
+        session = server.session
+        self.assertIs(session, server2.session)
+        self.assertIsNot(session, server3.session)
+        with server2:
+            pass
+        self.assertIsNot(session, server.session)
+        server.close()
+        server3.close()
+
+    def testCookies(self):
+        class Headers(object):
+            def get_all(self, name, default=None):
+                if name == 'Set-Cookie':
+                    return ['session=tester; Path=/']
+                return default
+            def getheaders(self, name):
+                return self.get_all(name, [])
+        request = requests.cookies.MockRequest(requests.Request('GET',
+            'http://test.wididit.net/api/json/whoami/').prepare())
+        response = requests.cookies.MockResponse(Headers())
+        jar = requests.cookies.RequestsCookieJar()
+        jar.extract_cookies(response, request)
+        self.assertEqual(len(jar), 1)
+        server = Server('test.wididit.net')
+        server.session.cookies.extract_cookies(response, request)
+        self.assertEqual(len(server.session.cookies), 0)
+        server.close()
+
+    def testRetries(self):
+        server = Server('test.wididit.net', retries=2, retry_backoff=0.001)
+        self.down = 2
+        self.assertEqual(server.get('foo'), '->foo<-')
+        self.assertEqual(self.calls, ['foo'] * 3)
+        self.assertEqual(server.stats['retries'], 2)
+        self.down = 3
+        self.assertRaises(exceptions.Unreachable, server.get, 'bar')
+        self.down = 1
+        self.assertRaises(exceptions.Unreachable, server.post, 'baz')
+        self.assertEqual(self.calls, ['foo'] * 3 + ['bar'] * 3 + ['baz'])
+        self.assertEqual(server.health['failures'], 2)
+        for attempt in range(1, 20):
+            self.assertTrue(0 <= server._retry_delay(attempt) <=
+                    server.retry_backoff_max)
+
+    def testBreaker(self):
+        server = Server('test.wididit.net')
+        server.breaker.threshold = 3
+        server.breaker.recovery_time = 0.01
+        self.down = 1000
+        for x in range(3):
+            self.assertRaises(exceptions.Unreachable, server.get, 'foo')
+        self.assertIn(server.health['state'], (breaker.OPEN, breaker.PROBING))
+        self.assertEqual(server.health['failures'], 3)
+        self.down = 0
+        deadline = time.time() + 5
+        while server.health['state'] != breaker.CLOSED and \
+                time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(server.health['state'], breaker.CLOSED)
+        self.assertIn('/whoami/', self.calls)
+        self.assertEqual(server.get('foo'), '->foo<-')
+        self.assertEqual(breaker.health()['test.wididit.net']['failures'], 0)
+
+        self.down = 1000
+        server.breaker.recovery_time = 60
+        for x in range(3):
+            self.assertRaises(exceptions.Unreachable, server.get, 'foo')
+        self.calls = []
+        self.assertRaises(exceptions.Unreachable, server.get, 'foo')
+        self.assertEqual(self.calls, [])
+        self.assertEqual(server.stats['short_circuited'], 1)
+
+    def testBreakerProbe(self):
+        probe = Server('test.wididit.net').breaker._probe
+        WididitObject.clear_instances()
+        server = Server('test.wididit.net')
+        probes = []
+        server._get = lambda url, **kwargs: probes.append(url)
+        probe('test.wididit.net')
+        self.assertEqual(probes, ['/whoami/'])
+
+    def testCoalesce(self):
+        server = Server('test.wididit.net')
+        release = threading.Event()
+        def get(url, **kwargs):
+            self.calls.append(url)
+            release.wait(5)
+            response = requests.Response()
+            response._content = b'{"id": 1}'
+            return response
+        self.get = get
+        responses = []
+        threads = [threading.Thread(target=lambda:
+                responses.append(server.get('foo'))) for x in range(4)]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 5
+        while server.stats['coalesced'] < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, ['foo'])
+        self.assertEqual(server.stats['coalesced'], 3)
+        self.assertEqual(len(responses), 4)
+        self.assertTrue(all(x is responses[0] for x in responses))
+        data = server.unserialize_response(responses[0])
+        self.assertEqual(data, {'id': 1})
+        self.assertIs(server.unserialize_response(responses[1]), data)
+
+        server.get('foo', params={'page': 2})
+        server.get('foo')
+        self.assertEqual(self.calls, ['foo'] * 3)
+        self.assertEqual(server.stats['coalesced'], 3)
+
+    def testCodec(self):
+        data = {'id': 1, 'content': u'caf\xe9', 'contributors': []}
+        self.assertEqual(Server.unserialize(Server.serialize(data)), data)
+        self.assertIs(Server.unserialize, jsoncodec.get_default().loads)
+        server = Server('test.wididit.net')
+        self.assertIs(server.unserialize, jsoncodec.get_default().loads)
+        Server('test.wididit.net', codec='json')
+        self.assertEqual(server.codec.name, 'json')
+        self.assertEqual(server.unserialize(b'{"id": 1}'), {'id': 1})
+        self.assertEqual(server.serialize([1]), '[1]')
+        self.assertIn('json', jsoncodec.available())
+
+        calls = []
+        def loads(data):
+            calls.append(data)
+            return jsoncodec.get_codec('json').loads(data)
+        jsoncodec.register('tracing',
+                lambda:jsoncodec.Codec('tracing', loads, None))
+        self.addCleanup(jsoncodec.unregister, 'tracing')
+        server = Server('test2.wididit.net', codec='tracing')
+        self.assertEqual(server.unserialize(b'[]'), [])
+        self.assertEqual(calls, [b'[]'])
+        self.assertIs(Server.unserialize, jsoncodec.get_default().loads)
+        self.assertRaises(KeyError, jsoncodec.get_codec, 'nonexistent')
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import shutil
+import unittest
+import requests
+import tempfile
+
+from wididit import Server, People, Entry
+from wididit.store import SQLiteStore
+from wididit.wididitobject import WididitObject
+from wididittestcase import WididitTestCase, make_reply
+
+class TestSQLiteStore(WididitTestCase):
+    def get(self, url, params={}, **kwargs):
+        self.queries.append(dict(params))
+        entries = [make_reply(id_,
+                    content='content %i%s' % (id_, ' #even' * (id_ % 2)),
+                    author={'username': 'tester%i' % (id_ % 3),
+                            'biography': 'biography %i' % (id_ % 3),
+                            'server': {'hostname': 'test.wididit.net'}},
+                    contributors=['tester0@test.wididit.net'],
+                    updated='2011-12-30 15:%02i:00' % id_)
+                for id_ in range(1, self.count + 1)]
+        if self.late:
+            # Updated during the same second as the last one.
+            entries.append(dict(entries[-1], id=self.count + 1))
+        if 'since' in params:
+            entries = [x for x in entries if x['updated'] > params['since']]
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        response._content = Server.serialize(entries)
+        return response
+
+    def setUp(self):
+        super(TestSQLiteStore, self).setUp()
+        self.queries = []
+        self.count = 6
+        self.late = False
+        self.server = Server('test.wididit.net')
+        self.directory = tempfile.mkdtemp()
+        self.store = SQLiteStore(os.path.join(self.directory, 'store.sqlite'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+        super(TestSQLiteStore, self).tearDown()
+
+    def query(self):
+        return Entry.Query(self.server, Entry.Query.MODE_ALL)
+
+    def testSync(self):
+        self.assertEqual(self.store.sync(self.server), 6)
+        self.assertEqual(len(self.store), 6)
+        self.count = 8
+        query = self.query()
+        self.assertEqual(self.store.sync(self.server, query), 2)
+        self.assertEqual(query._params, {})
+        self.assertEqual(self.store.sync(self.server, self.query()), 0)
+        self.assertEqual(self.queries, [{},
+            {'since': '2011-12-30 15:05:59'},
+            {'since': '2011-12-30 15:07:59'}])
+        self.assertEqual(len(self.store), 8)
+        self.late = True
+        self.assertEqual(self.store.sync(self.server, self.query()), 1)
+        self.assertEqual(len(self.store), 9)
+        self.assertEqual(self.store.high_water_mark(self.server,
+            self.query()), self.store.fetch(self.query())[0]
+                .updated_timestamp)
+
+    def testOffline(self):
+        self.store.sync(self.server)
+        self.queries = []
+        entries = self.store.fetch(self.query())
+        self.assertEqual([x.id for x in entries], [6, 5, 4, 3, 2, 1])
+        self.assertEqual(entries[0].contributors,
+                [People('tester0', 'test.wididit.net')])
+        self.assertEqual(entries[0].as_serializable['updated'],
+                '2011-12-30 15:06:00')
+        query = self.query().filterAuthor('tester1@test.wididit.net') \
+                .filterAuthor('tester2@test.wididit.net')
+        self.assertEqual([x.id for x in self.store.fetch(query)],
+                [5, 4, 2, 1])
+        query.filterContent('#even')
+        self.assertEqual([x.id for x in self.store.fetch(query)], [5, 1])
+        query = self.query().filterContent('content').filterContent('#even')
+        self.assertEqual([x.id for x in self.store.fetch(query.limit(2))],
+                [5, 3])
+        query = self.query().since('2011-12-30 15:04:00')
+        self.assertEqual([x.id for x in self.store.fetch(query)], [6, 5])
+        self.assertEqual(self.queries, [])
+
+    def testPeople(self):
+        self.store.sync(self.server)
+        store = SQLiteStore(os.path.join(self.directory, 'store.sqlite'))
+        self.assertEqual(len(store), 6)
+        self.assertEqual(store.get_people('nobody@test.wididit.net'), None)
+        WididitObject.clear_instances()
+        people = store.get_people('tester1@test.wididit.net')
+        self.assertEqual(people.biography, 'biography 1')
+        store.close()
+
+if __name__ == '__main__':
+    unittest.main()
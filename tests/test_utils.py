@@ -20,6 +20,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import time
+import threading
 import unittest
 
 from wididit import utils
@@ -42,6 +44,61 @@ class TestTags(unittest.TestCase):
                 {'spam': {'egg': {}}})
         self.assertEqual(utils.get_tag_tree('foo #spam bar #spam#egg baz'),
                 {'spam': {'egg': {}}})
+        self.assertEqual(utils.get_tag_tree('foo #spam# bar # baz'),
+                {'spam': {}})
+
+    def testGetTagTreeMany(self):
+        tree = utils.get_tag_tree_many(['#spam#egg and #spam', '#spam#bacon',
+            'no tag', '#spam#egg #egg'])
+        self.assertEqual(tree, {'spam': {'egg': {}, 'bacon': {}},
+            'egg': {}})
+        self.assertEqual(tree.count, 4)
+        self.assertEqual(tree['spam'].count, 3)
+        self.assertEqual(tree['spam']['egg'].count, 2)
+        self.assertEqual(tree['spam']['bacon'].count, 1)
+        self.assertEqual(tree['egg'].count, 1)
+        self.assertEqual(utils.get_tag_tree_many([]), {})
+
+class TestTime(unittest.TestCase):
+    def testTime(self):
+        self.assertEqual(utils.parse_time('2011-12-30 15:55:05'), 1325260505)
+        self.assertEqual(utils.format_time(1325260505), '2011-12-30 15:55:05')
+        self.assertEqual(utils.parse_time('1970-01-01 00:00:00'), 0)
+        self.assertEqual(utils.parse_time('2012-02-29 00:00:00'), 1330473600)
+        self.assertEqual(utils.format_time(1330473600), '2012-02-29 00:00:00')
+        self.assertRaises(ValueError, utils.parse_time, '2011-12-30T15:55:05')
+        self.assertRaises(ValueError, utils.parse_time, '2011-13-30 15:55:05')
+        self.assertRaises(ValueError, utils.parse_time, 'foo')
+        for string in ('2011-02-31 00:00:00', '2011-04-31 00:00:00',
+                '2011-02-29 00:00:00', '2011-12-30 -1:00:00',
+                '2011-12-30 10:-5:00', '2011-12-30 1 :00:00',
+                '+011-12-30 15:55:05', '2011-12-00 15:55:05',
+                '2011-12-30 15:55:05\n'):
+            self.assertRaises(ValueError, utils.parse_time, string)
+
+class TestConcurrency(unittest.TestCase):
+    def testMapConcurrently(self):
+        running = []
+        def function(x):
+            running.append(x)
+            time.sleep(0.01)
+            self.assertLessEqual(len(running), 3)
+            running.remove(x)
+            if x == 5:
+                raise ValueError(x)
+            return x * 2
+        calls = list(utils.map_concurrently(function, range(10), 3))
+        self.assertEqual([x.result() for x in calls[:5]], [0, 2, 4, 6, 8])
+        self.assertRaises(ValueError, calls[5].result)
+
+    def testMapConcurrentlyThreads(self):
+        threads = set()
+        def function(x):
+            threads.add(threading.current_thread())
+            return x
+        calls = utils.map_concurrently(function, range(50), 3)
+        self.assertEqual([x.result() for x in calls], list(range(50)))
+        self.assertLessEqual(len(threads), 3)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import gc
+import unittest
+
+from wididit.wididitobject import WididitObject
+
+class Thing(WididitObject):
+    _singleton = True
+    def __new__(cls, name):
+        return super(Thing, cls).__new__(cls, name)
+
+    def __init__(self, name):
+        self.name = name
+
+class TestWididitObject(unittest.TestCase):
+    def tearDown(self):
+        Thing.set_strong_cache_size(0)
+        Thing.clear_instances()
+
+    def testIdentity(self):
+        self.assertIs(Thing('foo'), Thing('foo'))
+        self.assertIsNot(Thing('foo'), Thing('bar'))
+        self.assertEqual(Thing('foo'), Thing('foo'))
+        self.assertNotEqual(Thing('foo'), Thing('bar'))
+        self.assertEqual(len(set([Thing('foo'), Thing('foo')])), 1)
+
+    def testWeakReferences(self):
+        foo = Thing('foo')
+        Thing('bar')
+        gc.collect()
+        self.assertEqual(Thing.instances(), [foo])
+        self.assertIn(foo, WididitObject.instances())
+        del foo
+        gc.collect()
+        self.assertEqual(len(Thing.get_registry()), 0)
+
+    def testStrongCache(self):
+        Thing.set_strong_cache_size(2)
+        Thing('foo')
+        Thing('bar')
+        Thing('foo')
+        Thing('baz')
+        gc.collect()
+        self.assertEqual(sorted(x.name for x in Thing.instances()),
+                ['baz', 'foo'])
+        Thing.set_strong_cache_size(1)
+        gc.collect()
+        self.assertEqual(len(Thing.get_registry()), 1)
+        Thing.set_strong_cache_size(None)
+        Thing('bar')
+        Thing('qux')
+        gc.collect()
+        self.assertEqual(len(Thing.get_registry()), 3)
+
+    def testClear(self):
+        foo = Thing('foo')
+        WididitObject.clear_instances()
+        self.assertEqual(Thing.instances(), [])
+        self.assertIsNot(foo, Thing('foo'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,6 +25,27 @@ import unittest
 import wididit
 from wididit.wididitobject import WididitObject
 
+def make_reply(id_, **fields):
+    """Return an entry as sent by servers. Fields can be replaced with
+    keyword-arguments."""
+    reply = {
+            'id': id_,
+            'content': 'content %i' % id_,
+            'author': 'tester@test.wididit.net',
+            'category': '',
+            'contributors': [],
+            'generator': 'the generator',
+            'published': '2011-12-30 15:54:00',
+            'rights': '',
+            'source': '',
+            'subtitle': '',
+            'summary': '',
+            'title': 'title %i' % id_,
+            'updated': '2011-12-30 15:55:05',
+            }
+    reply.update(fields)
+    return reply
+
 class WididitTestCase(unittest.TestCase):
     class callback:
         pass
@@ -34,4 +55,4 @@ class WididitTestCase(unittest.TestCase):
 
     def tearDown(self):
         wididit._test_callback = None
-        WididitObject.__instances = {}
+        WididitObject.clear_instances()
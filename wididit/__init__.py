@@ -23,14 +23,14 @@ __version__ = '0.1'
 
 import sys
 
-import constants, utils, exceptions
+from wididit import constants, utils, exceptions
 if 'unittest' in sys.modules:
-    from server import FakeServer as Server
+    from wididit.server import FakeServer as Server
 else:
-    from server import RealServer as Server
+    from wididit.server import RealServer as Server
 # Avoid Sphinx telling "Server: alias of RealServer"
 # (and probably useful for developpers using this library).
 Server.__name__ = 'Server'
 
-from people import People
-from entry import Entry
+from wididit.people import People
+from wididit.entry import Entry
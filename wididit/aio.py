@@ -0,0 +1,475 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Asynchronous variant of the client, based on :py:mod:`asyncio`.
+
+It requires Python 3.5, and ``aiohttp`` to talk to real servers.
+
+.. code-block:: python
+
+    people = People('ProgVal', 'example.com')
+    await people.async_sync()
+    query = Entry.Query(people.server, Entry.Query.MODE_ALL)
+    entries = await query.afetch()
+    async for entry in query.filterAuthor(people):
+        print(entry.title)
+
+Requests are performed by :py:class:`AsyncServer`, which shares its
+authentication with the blocking :py:class:`wididit.Server`.
+"""
+
+import sys
+import asyncio
+import inspect
+import threading
+import collections
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import wididit
+from wididit import exceptions
+from wididit.wididitobject import WididitObject
+
+if aiohttp is None:
+    _connection_errors = (OSError, asyncio.TimeoutError)
+else:
+    _connection_errors = (OSError, asyncio.TimeoutError,
+            aiohttp.ClientConnectionError)
+
+
+class AsyncRealServer(WididitObject):
+    """Asynchronous representation of a Wididit server.
+
+    Its methods are coroutines. The authentication, the API base, the
+    retries, the circuit breaker, the observers and the cache are the ones
+    of the blocking :py:class:`wididit.Server` bound to the same hostname
+    and user (see :py:attr:`server`). Like them, instances of the same
+    hostname share their connections and settings.
+
+    :param hostname: The hostname of the server.
+    :param connect_as: The People instance used to authenticate.
+    :param limit_per_host: The maximum number of simultaneous connections to
+                           this server.
+    :param timeout: The default timeout of requests, in seconds.
+    """
+    _singleton = True
+    # Like blocking servers, they are never freed, so their connection pools
+    # are reused.
+    _strong_cache_size = None
+    __slots__ = ('_connected_as', '__dict__')
+    limit_per_host = 10
+    """Default maximum number of simultaneous connections to a server."""
+    timeout = 30
+    """Default timeout of requests, in seconds."""
+
+    def __new__(cls, hostname, connect_as=None, *args, **kwargs):
+        if connect_as is None:
+            return super(AsyncRealServer, cls).__new__(cls, hostname)
+        return super(AsyncRealServer, cls).__new__(cls, hostname,
+                connect_as.username)
+
+    def __init__(self, hostname, connect_as=None, limit_per_host=None,
+            timeout=None):
+        super(AsyncRealServer, self).__init__()
+        if connect_as is not None:
+            self.__dict__ = type(self)(hostname).__dict__
+        self._connected_as = connect_as
+        self._hostname = hostname
+        if limit_per_host is not None:
+            self.limit_per_host = limit_per_host
+        if timeout is not None:
+            self.timeout = timeout
+        if not hasattr(self, '_sessions'):
+            self._sessions = {}
+        if not hasattr(self, '_flights'):
+            self._flights = {}
+
+    def __repr__(self):
+        return "wididit.aio.AsyncServer('%s')" % self.hostname
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def hostname(self):
+        """The hostname of the server."""
+        return self._hostname
+
+    @property
+    def connected_as(self):
+        """The People instance used to authenticate to the server, as given
+        to the constructor."""
+        return self._connected_as
+
+    @property
+    def server(self):
+        """The blocking :py:class:`wididit.Server` bound to the same
+        hostname and user."""
+        return wididit.Server(self.hostname, self._connected_as)
+
+    @property
+    def session(self):
+        """The aiohttp session holding the connection pool to this
+        server. There is one per event loop; it is bound to the running
+        one."""
+        if aiohttp is None:
+            raise ImportError('aiohttp is required to reach real servers.')
+        loop = asyncio.get_event_loop()
+        for other in [x for x in self._sessions if x.is_closed()]:
+            del self._sessions[other]
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                    limit_per_host=self.limit_per_host)
+            # Shared by all users of the hostname: never keep cookies.
+            session = aiohttp.ClientSession(connector=connector,
+                    cookie_jar=aiohttp.DummyCookieJar())
+            self._sessions[loop] = session
+        return session
+
+    async def close(self):
+        """Close all connections to this server from the running event
+        loop."""
+        session = self._sessions.pop(asyncio.get_event_loop(), None)
+        if session is not None:
+            await session.close()
+
+    @staticmethod
+    def _params_as_items(params):
+        """Convert parameters as ``requests`` takes them to a list of
+        items; lists are repeated and None values are dropped."""
+        items = []
+        for (key, value) in (params or {}).items():
+            if isinstance(value, (list, tuple)):
+                items.extend([(key, x) for x in value])
+            elif value is not None:
+                items.append((key, value))
+        return items
+
+    async def _request(self, method, url, params=None, auth=None, **kwargs):
+        if auth is not None:
+            kwargs['auth'] = aiohttp.BasicAuth(*auth)
+        kwargs.setdefault('timeout', aiohttp.ClientTimeout(total=self.timeout))
+        async with self.session.request(method, self.server.api_base + url,
+                params=self._params_as_items(params), **kwargs) as reply:
+            response = requests.Response()
+            response.status_code = reply.status
+            response.headers.update(reply.headers)
+            response.url = str(reply.url)
+            response._content = await reply.read()
+        return response
+
+    async def _send(self, event, function, url, kwargs, cache=None,
+            idempotent=True):
+        """Perform a request with this coroutine function, like
+        :py:meth:`wididit.Server._send` does."""
+        server = self.server
+        breaker_ = server.breaker
+        if breaker_ is not None and not breaker_.allow():
+            server._count('short_circuited')
+            error = exceptions.Unreachable(self.hostname)
+            server._finish(event, error=error, cache=cache)
+            raise error
+        attempt = 0
+        while True:
+            try:
+                response = await function(url, **kwargs)
+            except _connection_errors as e:
+                if idempotent and attempt < server.retries:
+                    attempt += 1
+                    server._count('retries')
+                    await asyncio.sleep(server._retry_delay(attempt))
+                    continue
+                if breaker_ is not None:
+                    breaker_.failure(e)
+                server._finish(event, error=e, cache=cache)
+                raise exceptions.Unreachable(self.hostname)
+            except Exception as e:
+                server._finish(event, error=e, cache=cache)
+                raise
+            break
+        if breaker_ is not None:
+            breaker_.success()
+        server._finish(event, response, cache=cache)
+        return response
+
+    async def _get(self, url, **kwargs):
+        return await self._request('GET', url, **kwargs)
+    async def get(self, url, **kwargs):
+        """Perform a GET request to the server.
+
+        Identical requests sent by several tasks at the same time share a
+        single response (see :py:attr:`wididit.Server.coalesce`), which
+        should not be modified.
+
+        :param url: The URL to which perform the request
+        :param **kwargs: Optional arguments that ``requests`` takes.
+        """
+        server = self.server
+        kwargs = server._auth_on_kwargs(kwargs)
+        event = server._start('GET', url)
+        cache = server.cache
+        if cache is not None:
+            key = cache.key(url, kwargs.get('params'), kwargs['auth'])
+            response = cache.get(key)
+            if response is not None:
+                server._count('cache_hits')
+                server._finish(event, response, cache='hit')
+                return response
+        async def send():
+            response = await self._send(event, self._get, url, kwargs,
+                    cache=None if cache is None else 'miss')
+            if cache is not None:
+                cache.set(key, url, response)
+            return response
+        if not server.coalesce:
+            return await send()
+        flight = (asyncio.get_event_loop(), server._flight_key(url, kwargs))
+        task = self._flights.get(flight)
+        if task is None:
+            task = asyncio.ensure_future(send())
+            self._flights[flight] = task
+            task.add_done_callback(lambda x:self._flights.pop(flight, None))
+            # Cancelling the task waiting for the response does not cancel
+            # the request, which other tasks may be waiting for.
+            return await asyncio.shield(task)
+        server._count('coalesced')
+        try:
+            response = await asyncio.shield(task)
+        except Exception as e:
+            server._finish(event, error=e, cache='coalesced')
+            raise
+        server._finish(event, response, cache='coalesced')
+        return response
+
+    async def _post(self, url, **kwargs):
+        return await self._request('POST', url, **kwargs)
+    async def post(self, url, **kwargs):
+        """Perform a POST request to the server.
+
+        :param url: The URL to which perform the request
+        :param **kwargs: Optional arguments that ``requests`` takes.
+        """
+        server = self.server
+        kwargs = server._auth_on_kwargs(kwargs)
+        try:
+            return await self._send(server._start('POST', url), self._post,
+                    url, kwargs, idempotent=False)
+        finally:
+            server._invalidate(url)
+
+    async def _put(self, url, **kwargs):
+        return await self._request('PUT', url, **kwargs)
+    async def put(self, url, **kwargs):
+        """Perform a PUT request to the server.
+
+        :param url: The URL to which perform the request
+        :param **kwargs: Optional arguments that ``requests`` takes.
+        """
+        server = self.server
+        kwargs = server._auth_on_kwargs(kwargs)
+        try:
+            return await self._send(server._start('PUT', url), self._put,
+                    url, kwargs)
+        finally:
+            server._invalidate(url)
+
+    async def _delete(self, url, **kwargs):
+        return await self._request('DELETE', url, **kwargs)
+    async def delete(self, url, **kwargs):
+        """Perform a DELETE request to the server.
+
+        :param url: The URL to which perform the request
+        :param **kwargs: Optional arguments that ``requests`` takes.
+        """
+        server = self.server
+        kwargs = server._auth_on_kwargs(kwargs)
+        try:
+            return await self._send(server._start('DELETE', url),
+                    self._delete, url, kwargs)
+        finally:
+            server._invalidate(url)
+
+class AsyncFakeServer(AsyncRealServer):
+    """Mocks a Wididit server (for testing purposes).
+
+    Callbacks may either return responses or coroutines."""
+    def __init__(self, *args, **kwargs):
+        if wididit._test_callback is None:
+            raise ImportError('No callback defined for tests.')
+        super(AsyncFakeServer, self).__init__(*args, **kwargs)
+
+    async def _call(self, method, url, **kwargs):
+        response = getattr(wididit._test_callback, method)(url, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+    async def _get(self, url, **kwargs):
+        return await self._call('get', url, **kwargs)
+    async def _post(self, url, **kwargs):
+        return await self._call('post', url, **kwargs)
+    async def _put(self, url, **kwargs):
+        return await self._call('put', url, **kwargs)
+    async def _delete(self, url, **kwargs):
+        return await self._call('delete', url, **kwargs)
+
+if 'unittest' in sys.modules:
+    AsyncServer = AsyncFakeServer
+else:
+    AsyncServer = AsyncRealServer
+AsyncServer.__name__ = 'AsyncServer'
+
+
+async def sync(obj, server):
+    """Update the state of a People or an Entry from the server.
+
+    :param obj: The object to be updated.
+    :param server: The blocking server this object is bound to."""
+    async_server = AsyncServer(server.hostname, server.connected_as)
+    response = await async_server.get(obj.api_path,
+            headers=obj._conditional_headers())
+    obj._load_response(response)
+    return obj
+
+async def fetch(query, revalidate=False):
+    """Return all entries matching an :py:class:`wididit.Entry.Query`.
+
+    :param query: The query.
+    :param revalidate: Determines whether or not each entry is fetched
+                       again from the server (concurrently)."""
+    entries = []
+    iterator = QueryIterator(query)
+    while True:
+        try:
+            entries.append(await iterator.__anext__())
+        except StopAsyncIteration:
+            break
+    if revalidate:
+        await asyncio.gather(*[x.async_sync() for x in entries])
+    return entries
+
+class QueryIterator(object):
+    """Asynchronous iterator over the results of a query. While a page is
+    consumed, the next one is fetched in the background."""
+    def __init__(self, query):
+        self._query = query
+        self._server = AsyncServer(query._server.hostname,
+                query._server.connected_as)
+        self._page = iter(())
+        self._keys = ()
+        self._seen = set()
+        self._next_page = None
+        self._offset = 0
+        self._count = 0
+        self._started = False
+
+    def __aiter__(self):
+        return self
+
+    async def _fetch_page(self, offset):
+        params = self._query._page_request(offset)[0]
+        response = await self._server.get(self._query._url, params=params)
+        return self._query._load_response(response)
+
+    def _stop(self):
+        if self._next_page is not None:
+            self._next_page.cancel()
+            self._next_page = None
+        raise StopAsyncIteration()
+
+    async def __anext__(self):
+        query = self._query
+        while True:
+            if query._limit is not None and self._count >= query._limit:
+                self._stop()
+            for (key, entry) in self._page:
+                if key not in self._seen and query._accepts(entry):
+                    self._count += 1
+                    return entry
+            if not self._started:
+                self._started = True
+                self._next_page = asyncio.ensure_future(self._fetch_page(0))
+            if self._next_page is None:
+                self._stop()
+            page = await self._next_page
+            keys = [query._entry_key(x) for x in page]
+            self._seen = set(self._keys)
+            self._keys = keys
+            if keys and self._seen.issuperset(keys):
+                self._stop() # The server ignored the offset.
+            if query._is_last_page(len(page), self._offset):
+                self._next_page = None
+            else:
+                self._next_page = asyncio.ensure_future(
+                        self._fetch_page(self._offset + len(page)))
+            self._offset += len(page)
+            self._page = iter(zip(keys, page))
+
+class FollowerIterator(object):
+    """Asynchronous iterator over the new entries found by a
+    :py:class:`wididit.follower.TimelineFollower`, which polls in its own
+    threads."""
+    def __init__(self, follower):
+        self._follower = follower
+        self._lock = threading.Lock()
+        self._pages = collections.deque()
+        self._page = iter(())
+        self._waiter = None
+        follower.add_callback(self._deliver)
+
+    def _deliver(self, entries):
+        with self._lock:
+            self._pages.append(entries)
+            if self._waiter is not None:
+                loop, future = self._waiter
+                self._waiter = None
+                loop.call_soon_threadsafe(_wake_up, future)
+
+    def close(self):
+        """Stop receiving entries from the follower."""
+        self._follower.remove_callback(self._deliver)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            for entry in self._page:
+                return entry
+            with self._lock:
+                if self._pages:
+                    self._page = iter(self._pages.popleft())
+                    continue
+                loop = asyncio.get_event_loop()
+                self._waiter = (loop, loop.create_future())
+                future = self._waiter[1]
+            await future
+
+def _wake_up(future):
+    if not future.done():
+        future.set_result(None)
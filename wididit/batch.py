@@ -0,0 +1,225 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Columnar representation of query results.
+
+.. code-block:: python
+
+    batch = Entry.Query(server, Entry.Query.MODE_ALL).fetch_batch()
+    recent = batch.filter_by_author('ProgVal@example.com') \
+            .between(published_from=1325376000).sort_by('updated').take(10)
+    for entry in recent:
+        print(entry.title)
+
+Columns are stored in NumPy arrays if NumPy is installed, and in
+:py:mod:`array` arrays otherwise.
+"""
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from wididit import utils
+from wididit import People, Entry
+
+try:
+    array.array('q')
+    _typecode = 'q'
+except ValueError: # Python 2
+    _typecode = 'l'
+
+_text_fields = ('category', 'generator', 'rights', 'source', 'subtitle',
+        'summary', 'title')
+
+class _Columns(object):
+    """The columns of a batch. They are shared by all batches derived from
+    the same query results."""
+    def __init__(self, replies):
+        self.count = len(replies)
+        self.authors = []
+        author_indices = {}
+        ids = []
+        authors = []
+        published = []
+        updated = []
+        offsets = [0]
+        contents = []
+        # Short fields, which often have the same value, are interned.
+        texts = dict([(x, []) for x in _text_fields])
+        contributors = []
+        for reply in replies:
+            userid = utils.reply_userid(reply['author'])
+            if userid not in author_indices:
+                author_indices[userid] = len(self.authors)
+                self.authors.append(userid)
+            ids.append(reply['id'])
+            authors.append(author_indices[userid])
+            published.append(utils.parse_time(reply['published']))
+            updated.append(utils.parse_time(reply['updated']))
+            contents.append(reply['content'])
+            offsets.append(offsets[-1] + len(reply['content']))
+            for name in _text_fields:
+                texts[name].append(utils.intern_string(reply[name]))
+            contributors.append(tuple([utils.reply_userid(x)
+                for x in reply['contributors']]))
+        self.author_indices = author_indices
+        self.id = self.array(ids)
+        self.author = self.array(authors)
+        self.published = self.array(published)
+        self.updated = self.array(updated)
+        self.content = ''.join(contents)
+        self.content_offsets = self.array(offsets)
+        self.texts = texts
+        self.contributors = contributors
+
+    @staticmethod
+    def array(values):
+        if numpy is not None:
+            return numpy.array(values, dtype=numpy.int64)
+        return array.array(_typecode, values)
+
+    def reply(self, row):
+        """Return the server reply of an entry, rebuilt from the columns."""
+        offsets = self.content_offsets
+        reply = dict([(x, y[row]) for (x, y) in self.texts.items()])
+        reply.update(id=int(self.id[row]),
+                author=self.authors[self.author[row]],
+                content=self.content[offsets[row]:offsets[row + 1]],
+                contributors=list(self.contributors[row]),
+                published=utils.format_time(int(self.published[row])),
+                updated=utils.format_time(int(self.updated[row])))
+        return reply
+
+class EntryBatch(object):
+    """Results of a query, stored by columns: IDs, authors, publication and
+    update times, and contents.
+
+    Filtering and sorting methods return new batches, sharing the columns of
+    this one. Entry instances are only built when they are accessed.
+
+    :param replies: A list of dictionaries from server replies.
+    """
+    def __init__(self, replies, _columns=None, _rows=None):
+        if _columns is None:
+            _columns = _Columns(replies)
+        self._columns = _columns
+        if _rows is None:
+            _rows = _columns.array(range(_columns.count))
+        self._rows = _rows
+
+    def _derive(self, rows):
+        if isinstance(rows, list):
+            rows = self._columns.array(rows)
+        return EntryBatch(None, self._columns, rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._derive(self._rows[index])
+        return Entry.from_reply(self._columns.reply(self._rows[index]))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def column(self, name):
+        """Return the values of a column ('id', 'author', 'published' or
+        'updated') for the entries of this batch. Authors are given as
+        indices in :py:attr:`authors`; times as timestamps."""
+        column = getattr(self._columns, name)
+        if numpy is not None:
+            return column[self._rows]
+        return array.array(_typecode, [column[x] for x in self._rows])
+
+    @property
+    def authors(self):
+        """The userids of all authors of the query results."""
+        return self._columns.authors
+
+    def content(self, index):
+        """Return the content of an entry of this batch."""
+        row = self._rows[index]
+        offsets = self._columns.content_offsets
+        return self._columns.content[offsets[row]:offsets[row + 1]]
+
+    def filter_by_author(self, *authors):
+        """Return a batch of the entries written by one of these authors.
+
+        :param *authors: Valid representations of people.
+        """
+        indices = set()
+        for author in authors:
+            userid = People.from_anything(author).userid
+            if userid in self._columns.author_indices:
+                indices.add(self._columns.author_indices[userid])
+        column = self._columns.author
+        if numpy is not None:
+            mask = numpy.isin(column[self._rows], list(indices))
+            return self._derive(self._rows[mask])
+        return self._derive([x for x in self._rows if column[x] in indices])
+
+    def between(self, published_from=None, published_to=None):
+        """Return a batch of the entries published between these times
+        (inclusive).
+
+        :param published_from: A timestamp, or None.
+        :param published_to: A timestamp, or None.
+        """
+        column = self._columns.published
+        if numpy is not None:
+            values = column[self._rows]
+            mask = numpy.ones(len(self._rows), dtype=bool)
+            if published_from is not None:
+                mask &= values >= published_from
+            if published_to is not None:
+                mask &= values <= published_to
+            return self._derive(self._rows[mask])
+        return self._derive([x for x in self._rows
+            if (published_from is None or column[x] >= published_from) and
+               (published_to is None or column[x] <= published_to)])
+
+    def sort_by(self, name, reverse=False):
+        """Return a batch of the same entries, sorted by a column.
+
+        :param name: 'id', 'author', 'published' or 'updated'.
+        :param reverse: Determines whether or not the greatest values come
+                        first.
+        """
+        column = getattr(self._columns, name)
+        if numpy is not None:
+            values = column[self._rows]
+            # Like sorted(), keep the order of equal values when reversing.
+            order = numpy.argsort(-values if reverse else values,
+                    kind='stable')
+            return self._derive(self._rows[order])
+        return self._derive(sorted(self._rows, key=column.__getitem__,
+            reverse=reverse))
+
+    def take(self, count):
+        """Return a batch of the first entries of this one.
+
+        :param count: The maximum number of entries.
+        """
+        return self._derive(self._rows[:count])
@@ -0,0 +1,146 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Circuit breakers, failing fast on requests to unreachable servers.
+
+After `threshold` consecutive requests to a server failed to connect, its
+breaker opens: further requests raise
+:py:class:`wididit.exceptions.Unreachable` at once, instead of waiting for a
+timeout. A background thread then probes the server every `recovery_time`
+seconds, and closes the breaker as soon as the server answers.
+
+The state of all breakers can be monitored with :py:func:`health`.
+"""
+
+import time
+import threading
+
+CLOSED = 'closed'
+"""Requests are sent."""
+OPEN = 'open'
+"""Requests fail immediately."""
+PROBING = 'probing'
+"""Requests fail immediately, while the server is being probed."""
+
+class CircuitBreaker(object):
+    """The circuit breaker of a server.
+
+    :param hostname: The hostname of the server.
+    :param probe: A function sending a request to the server of the given
+                  hostname, and raising an exception if it cannot be
+                  reached.
+    :param threshold: The number of consecutive failures opening the breaker.
+    :param recovery_time: The time between probes, in seconds.
+    """
+    def __init__(self, hostname, probe, threshold=5, recovery_time=30):
+        self.hostname = hostname
+        self.threshold = threshold
+        self.recovery_time = recovery_time
+        self._probe = probe
+        self._lock = threading.Lock()
+        self._wake_up = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self.state = CLOSED
+        self.failures = 0
+        """The number of consecutive failures."""
+        self.opened_at = None
+        self.last_error = None
+        self.probes = 0
+        """The number of probes since the breaker opened."""
+
+    def allow(self):
+        """Return whether or not a request can be sent."""
+        return self.state == CLOSED
+
+    def success(self):
+        """Record a request which reached the server."""
+        if self.failures or self.state != CLOSED:
+            with self._lock:
+                self._reset()
+
+    def failure(self, error):
+        """Record a request which could not reach the server."""
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            if self.state != CLOSED or self.failures < self.threshold:
+                return
+            self.state = OPEN
+            self.opened_at = time.time()
+            self._wake_up.clear()
+            thread = threading.Thread(target=self._run_probes)
+            thread.daemon = True
+            thread.start()
+
+    def reset(self):
+        """Close the breaker, and stop probing."""
+        with self._lock:
+            self._reset()
+            self._wake_up.set()
+
+    def _run_probes(self):
+        while True:
+            self._wake_up.wait(self.recovery_time)
+            with self._lock:
+                if self.state == CLOSED:
+                    return
+                self.state = PROBING
+                self.probes += 1
+            try:
+                self._probe(self.hostname)
+            except Exception as e:
+                with self._lock:
+                    if self.state == CLOSED:
+                        return
+                    self.state = OPEN
+                    self.last_error = e
+            else:
+                self.success()
+                return
+
+    def health(self):
+        """Return the state of the breaker, as a dict."""
+        with self._lock:
+            return {'state': self.state,
+                    'failures': self.failures,
+                    'opened_at': self.opened_at,
+                    'probes': self.probes,
+                    'last_error': None if self.last_error is None
+                                  else repr(self.last_error)}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(hostname, probe, **settings):
+    """Return the breaker of a server, creating it if needed.
+
+    See :py:class:`CircuitBreaker` for the parameters."""
+    with _breakers_lock:
+        if hostname not in _breakers:
+            _breakers[hostname] = CircuitBreaker(hostname, probe, **settings)
+        return _breakers[hostname]
+
+def health():
+    """Return the state of the breakers of all servers, by hostname."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return dict([(x.hostname, x.health()) for x in breakers])
@@ -0,0 +1,270 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Caches of server responses.
+
+A cache is enabled by giving it to a server:
+
+.. code-block:: python
+
+    cache = MemoryCache(rules=[('^/people/', 300), ('^/entry/.+/', 60)])
+    server = Server('example.com', cache=cache)
+
+Only successful GET requests are cached, for the time set by the first rule
+matching their path (paths which do not match any rule are not cached).
+Any PUT, POST or DELETE request to a path removes all the paths of its
+collection from the cache: a request to ``/entry/foo@example.com/1/``
+removes ``/entry/``, ``/entry/timeline/`` and the other entries, as they
+may list or include the entry which changed.
+"""
+
+import os
+import re
+import json
+import time
+import base64
+import hashlib
+import requests
+import tempfile
+import threading
+import collections
+
+class Cache(object):
+    """Base class for caches. Subclasses store the records.
+
+    :param rules: A list of (regexp, ttl) tuples. Responses to requests
+                  whose path matches the regexp are kept for ttl seconds.
+    :param default_ttl: The time responses to other requests are kept, in
+                        seconds. Defaults to None (not cached).
+    :param max_entries: The maximum number of responses in the cache.
+    :param max_bytes: The maximum size of the content of the responses in
+                      the cache, in bytes. Defaults to None (no limit).
+    """
+    def __init__(self, rules=(), default_ttl=None, max_entries=1024,
+            max_bytes=None):
+        self._rules = [(re.compile(x), y) for (x, y) in rules]
+        self._default_ttl = default_ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._index = collections.OrderedDict()
+        """Maps keys to (path, expiration time, size) tuples, least recently
+        used first."""
+        self._bytes = 0
+
+    @staticmethod
+    def key(url, params, auth):
+        """Return the key of a request.
+
+        :param url: The URL of the request, relative to the API base.
+        :param params: The parameters of the request.
+        :param auth: The authentication tuple, if any.
+        """
+        params = sorted([(x, tuple(y) if isinstance(y, list) else y)
+                for (x, y) in (params or {}).items()])
+        identity = auth[0] if auth is not None else None
+        return hashlib.sha1(repr((url, params, identity)).encode('utf8')) \
+                .hexdigest()
+
+    def ttl(self, path):
+        """Return the time responses to requests to this path are kept."""
+        for (regexp, ttl) in self._rules:
+            if regexp.search(path):
+                return ttl
+        return self._default_ttl
+
+    def get(self, key):
+        """Return the cached response for this key, or None."""
+        with self._lock:
+            if key not in self._index:
+                return None
+            (path, expires, size) = self._index.pop(key)
+            if expires < time.time():
+                self._remove(key, size)
+                return None
+            stored = self._read(key)
+            if stored is None:
+                self._bytes -= size
+                return None
+            self._index[key] = (path, expires, size)
+        (status_code, headers, content) = stored[2]
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update(headers)
+        response._content = content
+        return response
+
+    def set(self, key, path, response):
+        """Store the response to a request, if it can be cached.
+
+        :param key: The key of the request (see :py:meth:`key`).
+        :param path: The path of the request.
+        :param response: The response.
+        """
+        ttl = self.ttl(path)
+        if not ttl or response.status_code != requests.codes.ok:
+            return
+        content = response.content
+        size = len(content)
+        if self._max_bytes is not None and size > self._max_bytes:
+            return
+        record = (response.status_code, dict(response.headers), content)
+        with self._lock:
+            if key in self._index:
+                self._remove(key, self._index.pop(key)[2])
+            expires = time.time() + ttl
+            self._write(key, (path, expires, record))
+            self._index[key] = (path, expires, size)
+            self._bytes += size
+            self._evict()
+
+    @staticmethod
+    def _collection(path):
+        """Return the name of the collection of a path, such as 'entry'."""
+        return path.lstrip('/').split('/', 1)[0]
+
+    def invalidate(self, path):
+        """Remove all responses to requests to paths of the collection of
+        this path."""
+        collection = self._collection(path)
+        with self._lock:
+            for (key, (path2, expires, size)) in list(self._index.items()):
+                if self._collection(path2) == collection:
+                    del self._index[key]
+                    self._remove(key, size)
+
+    def clear(self):
+        """Remove all responses."""
+        with self._lock:
+            for (key, (path, expires, size)) in list(self._index.items()):
+                self._remove(key, size)
+            self._index.clear()
+
+    def _evict(self):
+        while self._index and (len(self._index) > self._max_entries or
+                (self._max_bytes is not None and
+                 self._bytes > self._max_bytes)):
+            (key, (path, expires, size)) = self._index.popitem(last=False)
+            self._remove(key, size)
+
+    def _remove(self, key, size):
+        self._bytes -= size
+        self._delete(key)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _read(self, key):
+        """Return the (path, expiration time, record) tuple stored with this
+        key, or None."""
+        raise NotImplementedError()
+
+    def _write(self, key, stored):
+        """Store a (path, expiration time, record) tuple with this key."""
+        raise NotImplementedError()
+
+    def _delete(self, key):
+        """Delete the record stored with this key, if any."""
+        raise NotImplementedError()
+
+class MemoryCache(Cache):
+    """Cache storing responses in memory."""
+    def __init__(self, *args, **kwargs):
+        super(MemoryCache, self).__init__(*args, **kwargs)
+        self._records = {}
+
+    def _read(self, key):
+        return self._records.get(key)
+
+    def _write(self, key, stored):
+        self._records[key] = stored
+
+    def _delete(self, key):
+        self._records.pop(key, None)
+
+class DiskCache(Cache):
+    """Cache storing responses in a directory, so they survive restarts.
+    They are stored as JSON, so reading them does not run code (unlike
+    pickle does), even if another user can write in the directory.
+
+    :param directory: The directory where responses are stored. It is
+                      created if needed.
+    """
+    def __init__(self, directory, *args, **kwargs):
+        super(DiskCache, self).__init__(*args, **kwargs)
+        self._directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._load_index()
+
+    def _filename(self, key):
+        return os.path.join(self._directory, key + '.cache')
+
+    def _load_index(self):
+        files = []
+        for name in os.listdir(self._directory):
+            if name.endswith('.cache'):
+                filename = os.path.join(self._directory, name)
+                files.append((os.path.getmtime(filename), name[:-6]))
+        now = time.time()
+        for (mtime, key) in sorted(files):
+            try:
+                (path, expires, record) = self._load(key)
+            except Exception:
+                self._delete(key)
+                continue
+            if expires < now:
+                self._delete(key)
+                continue
+            size = len(record[2])
+            self._index[key] = (path, expires, size)
+            self._bytes += size
+        self._evict()
+
+    def _load(self, key):
+        with open(self._filename(key), 'rb') as fd:
+            data = json.loads(fd.read().decode('utf8'))
+        record = (data['status'], data['headers'],
+                base64.b64decode(data['content'].encode('ascii')))
+        return (data['path'], data['expires'], record)
+
+    def _read(self, key):
+        try:
+            return self._load(key)
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def _write(self, key, stored):
+        (path, expires, (status_code, headers, content)) = stored
+        if not isinstance(content, bytes):
+            content = content.encode('utf8')
+        data = json.dumps({'path': path, 'expires': expires,
+            'status': status_code, 'headers': headers,
+            'content': base64.b64encode(content).decode('ascii')})
+        (fd, filename) = tempfile.mkstemp(dir=self._directory)
+        with os.fdopen(fd, 'wb') as fd:
+            fd.write(data.encode('utf8'))
+        os.rename(filename, self._filename(key))
+
+    def _delete(self, key):
+        try:
+            os.unlink(self._filename(key))
+        except OSError:
+            pass
@@ -18,34 +18,54 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import copy
 import time
+import heapq
+import contextlib
+import calendar
+import email.utils
 import requests
+import threading
+try:
+    import Queue as queue
+except ImportError: # Python 3
+    import queue
 
 from wididit import utils
+from wididit import jsoncodec
 from wididit.i18n import _
 from wididit import People
 from wididit import exceptions
 from wididit.wididitobject import WididitObject
 
+_edit_sessions = threading.local()
+"""The changes being made by this thread (see :py:meth:`Entry.editing`),
+as a dict mapping the id() of entries to dicts of new field values. Other
+threads only see the values once they are committed."""
+
+def _dirty(entry):
+    """Return the uncommitted changes made to this entry by this thread, or
+    None if it is not editing it."""
+    sessions = getattr(_edit_sessions, 'entries', None)
+    if not sessions:
+        return None
+    return sessions.get(id(entry))
+
 def editable_property_factory(name, assert_type=None, docstring=None):
     def get_property(self):
-        return getattr(self, '_' + name)
+        dirty = _dirty(self)
+        if dirty is not None and name in dirty:
+            return dirty[name]
+        value = getattr(self, '_' + name)
+        if assert_type is list:
+            # Stored as a tuple, to be immutable and compact.
+            value = list(value)
+        return value
     def set_property(self, value):
         if assert_type is not None and not isinstance(value, assert_type):
             raise ValueError()
-        state = self.as_serializable
-        state[name] = value
-        response = self.author.server.put(self.api_path, data=state)
-        if response.status_code == requests.codes.ok:
-            setattr(self, '_' + name, value)
-            response = self.author.server.get(self.api_path)
-            assert response.status_code == requests.codes.ok
-            reply = self.author.server.unserialize(response.content)
-            self._updated = time.strptime(reply['updated'], self._time_format)
-        elif response.status_code == requests.codes.forbidden:
-            raise exceptions.Forbidden(_('edit this entry'))
-        else:
-            raise exceptions.ServerException(response.status_code)
+        with self.editing():
+            _dirty(self)[name] = value
     return property(get_property, set_property, docstring)
 
 class Entry(WididitObject):
@@ -58,6 +78,9 @@ class Entry(WididitObject):
                server.
     """
     _singleton = True
+    __slots__ = ('_author', '_id', '_content', '_category', '_contributors',
+            '_generator', '_published', '_rights', '_source', '_subtitle',
+            '_summary', '_title', '_updated', '_validators')
     def __new__(cls, author, id=None, *args, **kwargs):
         author = People.from_anything(author)
         return super(Entry, cls).__new__(cls, author, id)
@@ -74,7 +97,7 @@ class Entry(WididitObject):
         assert len(missing_attr) == 0, \
                 'This attributes are missing: %s' % ', '.join(missing_attr)
 
-    _time_format = '%Y-%m-%d %H:%M:%S'
+    _time_format = utils.TIME_FORMAT
 
     @property
     def author(self):
@@ -91,22 +114,111 @@ class Entry(WididitObject):
         """The EntryID of this entry."""
         return '%s/%s' % (self.author.userid, self.id)
 
-    content = editable_property_factory('content', str)
-    category = editable_property_factory('category', str)
+    content = editable_property_factory('content', utils.string_types)
+    category = editable_property_factory('category', utils.string_types)
     contributors = editable_property_factory('contributors', list)
-    generator = editable_property_factory('generator', list)
-    rights = editable_property_factory('rights', list)
-    source = editable_property_factory('source', list)
-    subtitle = editable_property_factory('subtitle', list)
-    summary = editable_property_factory('summary', list)
-    title = editable_property_factory('title', list)
+    generator = editable_property_factory('generator', utils.string_types)
+    rights = editable_property_factory('rights', utils.string_types)
+    source = editable_property_factory('source', utils.string_types)
+    subtitle = editable_property_factory('subtitle', utils.string_types)
+    summary = editable_property_factory('summary', utils.string_types)
+    title = editable_property_factory('title', utils.string_types)
+
+    _editable_fields = ('content category contributors generator rights '
+            'source subtitle summary title').split()
+
+    @contextlib.contextmanager
+    def editing(self):
+        """Group changes made to this entry, and send them to the server with
+        a single request when leaving the block. Changes are discarded if an
+        exception is raised. Until then, they are only visible to the thread
+        making them.
+
+        .. code-block:: python
+
+            with entry.editing():
+                entry.title = 'New title'
+                entry.content = 'New content'
+        """
+        if _dirty(self) is not None:
+            # Nested block; the outermost one sends the changes.
+            yield self
+            return
+        sessions = getattr(_edit_sessions, 'entries', None)
+        if sessions is None:
+            sessions = _edit_sessions.entries = {}
+        dirty = sessions[id(self)] = {}
+        try:
+            yield self
+            if dirty:
+                self._commit(dirty)
+        finally:
+            del sessions[id(self)]
+
+    def update(self, **fields):
+        """Change some fields of this entry with a single request.
+
+        :param **fields: The new value of the fields.
+        """
+        invalid = [x for x in fields if x not in self._editable_fields]
+        if invalid:
+            raise AttributeError('Fields cannot be edited: %s' %
+                    ', '.join(invalid))
+        with self.editing():
+            for (name, value) in fields.items():
+                setattr(self, name, value)
+
+    def _commit(self, changes):
+        if 'contributors' in changes:
+            changes['contributors'] = tuple([People.from_anything(x)
+                    for x in changes['contributors']])
+        state = self.as_serializable
+        response = self.author.server.put(self.api_path, data=state)
+        if response.status_code == requests.codes.forbidden:
+            raise exceptions.Forbidden(_('edit this entry'))
+        elif response.status_code != requests.codes.ok:
+            raise exceptions.ServerException(response.status_code)
+        for (name, value) in changes.items():
+            setattr(self, '_' + name, value)
+        reply = None
+        if response.content:
+            try:
+                reply = self.author.server.unserialize_response(response)
+            except ValueError:
+                pass
+        if not isinstance(reply, dict) or 'updated' not in reply:
+            # The server did not tell the new update time.
+            response = self.author.server.get(self.api_path)
+            assert response.status_code == requests.codes.ok
+            reply = self.author.server.unserialize_response(response)
+        self._updated = utils.parse_time(reply['updated'])
+
+    def _fetch_times(self):
+        """Fetch the entry if its times are not known yet (see
+        :py:meth:`create_many`)."""
+        if not hasattr(self, '_updated'):
+            self._sync()
 
     @property
     def published(self):
-        return self._published
+        """The publication time of this entry, as a UTC struct_time."""
+        return time.gmtime(self.published_timestamp)
 
     @property
     def updated(self):
+        """The last update time of this entry, as a UTC struct_time."""
+        return time.gmtime(self.updated_timestamp)
+
+    @property
+    def published_timestamp(self):
+        """The publication time of this entry, in seconds since the epoch."""
+        self._fetch_times()
+        return self._published
+
+    @property
+    def updated_timestamp(self):
+        """The last update time of this entry, in seconds since the epoch."""
+        self._fetch_times()
         return self._updated
 
     @property
@@ -136,46 +248,136 @@ class Entry(WididitObject):
             dict_[name] = getattr(self, name)
         dict_['author'] = dict_['author'].userid
         dict_['contributors'] = [x.userid for x in dict_['contributors']]
-        dict_['published'] = time.strftime(self._time_format,
-                dict_['published'])
-        dict_['updated'] = time.strftime(self._time_format, dict_['updated'])
+        dict_['published'] = utils.format_time(self.published_timestamp)
+        dict_['updated'] = utils.format_time(self.updated_timestamp)
         return dict_
 
+    @classmethod
+    def from_reply(cls, data, revalidate=False):
+        """Return an Entry instance from its representation in a server reply.
+
+        The entry is built from the reply itself, without any request to the
+        server.
+
+        :param data: A dictionary from the server reply.
+        :param revalidate: Determines whether or not the entry is fetched
+                           again from the server instead.
+        """
+        author = People.from_anything(data['author'])
+        entry = super(Entry, cls).__new__(cls, author, data['id'])
+        entry._author = author
+        entry._id = data['id']
+        if revalidate:
+            entry._sync()
+        else:
+            entry._load(data)
+        return entry
+
+    def _load(self, reply):
+        self._content = reply['content']
+        self._category = reply['category']
+        self._contributors = tuple([People.from_anything(x)
+                for x in reply['contributors']])
+        self._generator = reply['generator']
+        self._rights = reply['rights']
+        self._source = reply['source']
+        self._subtitle = reply['subtitle']
+        self._summary = reply['summary']
+        self._title = reply['title']
+        if 'updated' in reply:
+            self._published = utils.parse_time(reply['published'])
+            self._updated = utils.parse_time(reply['updated'])
+
     def _sync(self, initial_data=None):
         if initial_data is None:
             assert self.id is not None
-            response = self.author.server.get(self.api_path)
-            if response.status_code == requests.codes.not_found:
-                raise exceptions.NotFound(_('entry %s') % self.entryid)
-            elif response.status_code != requests.codes.ok:
-                raise exceptions.ServerException(response.status_code)
-            reply = self.author.server.unserialize(response.content)
-            self._content = reply['content']
-            self._category = reply['category']
-            self._contributors = [People.from_anything(x)
-                    for x in reply['contributors']]
-            self._generator = reply['generator']
-            self._published = time.strptime(reply['published'], self._time_format)
-            self._rights = reply['rights']
-            self._source = reply['source']
-            self._subtitle = reply['subtitle']
-            self._summary = reply['summary']
-            self._title = reply['title']
-            self._updated = time.strptime(reply['updated'], self._time_format)
+            self._load_response(self.author.server.get(self.api_path,
+                headers=self._conditional_headers()))
         else:
             assert self.id is None
-            initial_data['author'] = self.author.userid
-            if 'generator' not in initial_data:
-                initial_data['generator'] = 'Wididit python library'
-            response = self.author.server.post(self.api_path,
-                    data=initial_data)
-            if response.status_code == requests.codes.forbidden:
-                raise exceptions.Forbidden(_('create an entry'))
-            elif response.status_code != requests.codes.created:
-                raise exceptions.ServerException(response.status_code)
+            self._id = self._post(self.author, initial_data)
+            self._sync()
+
+    @staticmethod
+    def _post(author, initial_data):
+        """Create an entry on the server, and return its ID."""
+        initial_data = dict(initial_data)
+        initial_data['author'] = author.userid
+        if 'generator' not in initial_data:
+            initial_data['generator'] = 'Wididit python library'
+        response = author.server.post('/entry/', data=initial_data)
+        if response.status_code == requests.codes.forbidden:
+            raise exceptions.Forbidden(_('create an entry'))
+        elif response.status_code != requests.codes.created:
+            raise exceptions.ServerException(response.status_code)
+        return int(response.content)
+
+    @classmethod
+    def create_many(cls, author, entries, concurrency=4, fetch=False):
+        """Create entries, with up to `concurrency` requests at the same
+        time.
+
+        Entries are read from the iterable as needed, and results are yielded
+        in the same order: either the new Entry, or the exception (such as a
+        :py:class:`wididit.exceptions.WididitException`) raised while
+        creating it.
+
+        :param author: The author of the entries. Can be any representation
+                       of a People object.
+        :param entries: An iterable of dictionaries of initial data, as
+                        given to the constructor.
+        :param concurrency: The maximum number of simultaneous requests.
+        :param fetch: Determines whether or not new entries are fetched from
+                      the server. If False, they are built from the given
+                      data, and fetched when their publication or update
+                      time is first needed.
+        """
+        author = People.from_anything(author)
+        def create(initial_data):
+            id_ = cls._post(author, initial_data)
+            entry = super(Entry, cls).__new__(cls, author, id_)
+            entry._author = author
+            entry._id = id_
+            if fetch:
+                entry._sync()
             else:
-                self._id = int(response.content)
-                self._sync()
+                # Times are left unset: only the server knows them.
+                reply = dict.fromkeys(cls._editable_fields, '')
+                reply.update(contributors=[],
+                        generator='Wididit python library')
+                reply.update(initial_data)
+                entry._load(reply)
+            return entry
+        for call in utils.map_concurrently(create, entries, concurrency):
+            try:
+                yield call.result()
+            except Exception as e:
+                yield e
+
+    def async_sync(self):
+        """Coroutine version of :py:meth:`sync`.
+
+        It requires Python 3.5; see :py:mod:`wididit.aio`."""
+        from wididit import aio
+        return aio.sync(self, self.author.server)
+
+    def _conditional_headers(self):
+        headers = super(Entry, self)._conditional_headers()
+        if 'If-Modified-Since' not in headers and hasattr(self, '_updated'):
+            headers['If-Modified-Since'] = email.utils.formatdate(
+                    self._updated, usegmt=True)
+        return headers
+
+    def _load_response(self, response):
+        if response.status_code == requests.codes.not_modified:
+            self.author.server._count('revalidated')
+            return
+        elif response.status_code == requests.codes.not_found:
+            raise exceptions.NotFound(_('entry %s') % self.entryid)
+        elif response.status_code != requests.codes.ok:
+            raise exceptions.ServerException(response.status_code)
+        self._store_validators(response)
+        self._load(self.author.server.unserialize_response(response))
 
     class Query(object):
         """Get entries from the server. Default mode is MODE_TIMELINE.
@@ -190,6 +392,14 @@ class Entry(WididitObject):
             server = Server('example.com')
             entries = Query(server).filterAuthor('ProgVal') \\
                     .filterContent('lol').filterContent('test').fetch()
+
+        Queries can also be iterated, which fetches results page by page if
+        :py:meth:`paginate` has been called:
+
+        .. code-block:: python
+
+            for entry in Query(server).paginate(50).limit(200):
+                print(entry.title)
         """
         MODE_ALL = 1
         """Fetch entries from all sources."""
@@ -206,6 +416,10 @@ class Entry(WididitObject):
             else:
                 raise ValueError('Invalid mode.')
             self._params = {}
+            self._page_size = None
+            self._limit = None
+            self._since = None
+            self._chunk_size = None
 
         def filterAuthor(self, author):
             """Only get results by this author.
@@ -259,16 +473,355 @@ class Entry(WididitObject):
                 del self._params['shared']
             return self
 
-        def fetch(self):
+        def paginate(self, page_size):
+            """Fetch results by pages of this size. While a page is consumed,
+            the next one is fetched in the background.
+
+            :param page_size: The number of entries per page, or None to
+                              fetch all results at once.
+            """
+            self._page_size = page_size
+            return self
+
+        def limit(self, count):
+            """Only get this number of results (at most). No more pages are
+            fetched once it is reached.
+
+            :param count: The maximum number of results, or None.
+            """
+            self._limit = count
+            return self
+
+        def stream(self, chunk_size=65536):
+            """Decode replies while they are downloaded, so that entries are
+            yielded before the end of the reply, and only one page of them
+            is held in memory. Pages are not fetched in the background.
+
+            :param chunk_size: The number of bytes read from the network at
+                               once, or None to wait for full replies.
+            """
+            self._chunk_size = chunk_size
+            return self
+
+        def since(self, updated):
+            """Only get results updated after this time.
+
+            :param updated: A time, as returned by
+                            :py:attr:`wididit.Entry.updated` or
+                            :py:attr:`wididit.Entry.updated_timestamp`, or a
+                            string in the format used by the server.
+            """
+            if isinstance(updated, utils.string_types):
+                updated = utils.parse_time(updated)
+            elif isinstance(updated, time.struct_time):
+                updated = calendar.timegm(updated)
+            self._since = updated
+            self._params['since'] = utils.format_time(updated)
+            return self
+
+        def copy(self):
+            """Return a copy of this query, whose filters can be changed
+            without changing the ones of this query."""
+            query = copy.copy(self)
+            query._params = dict([(x, list(y) if isinstance(y, list) else y)
+                for (x, y) in self._params.items()])
+            return query
+
+        def fetch(self, revalidate=False):
             """Return all entries matching this query.
+
+            Entries are built from the reply of the server, so fetching a
+            query costs a single request (or one per page).
+
+            :param revalidate: Determines whether or not each entry is
+                               fetched again from the server.
             """
-            response = self._server.get(self._url, params=self._params)
+            return list(self._iterate(revalidate))
+
+        def fetch_batch(self):
+            """Return all entries matching this query, as a
+            :py:class:`wididit.batch.EntryBatch`. Entry instances are only
+            built when they are accessed."""
+            from wididit.batch import EntryBatch
+            return EntryBatch(list(self._iterate(raw=True)))
+
+        def __iter__(self):
+            return self._iterate()
+
+        def _iterate(self, revalidate=False, raw=False):
+            """Yield the results, as entries, or as dictionaries from the
+            server reply if `raw` is True."""
+            if self._chunk_size is not None:
+                for entry in self._iterate_streaming(revalidate, raw):
+                    yield entry
+                return
+            count = 0
+            offset = 0
+            seen = set()
+            page = self._fetch_page(offset, revalidate, raw)
+            while True:
+                keys = [self._entry_key(x) for x in page]
+                if keys and seen.issuperset(keys):
+                    return # The server ignored the offset.
+                last = self._is_last_page(len(page), offset)
+                next_page = None
+                offset += len(page)
+                for (index, entry) in enumerate(page):
+                    if self._limit is not None and count >= self._limit:
+                        return
+                    # The next page is fetched in the background once half
+                    # of this one is consumed, so it is not requested if
+                    # iteration stops early.
+                    if not last and next_page is None and \
+                            index >= len(page) // 2:
+                        next_page = utils.BackgroundCall(self._fetch_page,
+                                offset, revalidate, raw)
+                    if keys[index] not in seen and self._accepts(entry):
+                        count += 1
+                        yield entry
+                if last:
+                    return
+                seen = set(keys)
+                page = next_page.result()
+
+        def _fetch_page(self, offset, revalidate=False, raw=False):
+            params = self._page_request(offset)[0]
+            response = self._server.get(self._url, params=params)
+            return self._load_response(response, revalidate, raw)
+
+        def _iterate_streaming(self, revalidate=False, raw=False):
+            count = 0
+            offset = 0
+            seen = set()
+            while True:
+                keys = []
+                page = self._stream_page(offset, revalidate, raw)
+                try:
+                    for entry in page:
+                        keys.append(self._entry_key(entry))
+                        if self._limit is not None and count >= self._limit:
+                            return
+                        if keys[-1] not in seen and self._accepts(entry):
+                            count += 1
+                            yield entry
+                finally:
+                    page.close()
+                if self._is_last_page(len(keys), offset) or \
+                        (keys and seen.issuperset(keys)):
+                    return
+                seen = set(keys)
+                offset += len(keys)
+
+        def _stream_page(self, offset, revalidate=False, raw=False):
+            """Yield the entries of a page while its reply is downloaded."""
+            params = self._page_request(offset)[0]
+            response = self._server.get(self._url, params=params, stream=True)
+            try:
+                if response.status_code != requests.codes.ok:
+                    raise exceptions.ServerException(response.status_code)
+                if response.raw is None: # Not read from the network
+                    chunks = [response.content]
+                else:
+                    chunks = response.iter_content(self._chunk_size)
+                for data in jsoncodec.iter_array(chunks):
+                    yield data if raw else Entry.from_reply(data, revalidate)
+            finally:
+                response.close()
+
+        def _page_request(self, offset):
+            """Return the parameters of the request for the page starting at
+            this offset, and the number of entries requested."""
+            count = self._page_size
+            if self._limit is not None:
+                count = self._limit - offset if count is None else \
+                        min(count, self._limit - offset)
+            if count is None:
+                return self._params, None
+            params = dict(self._params)
+            params['count'] = count
+            params['offset'] = offset
+            return params, count
+
+        def _is_last_page(self, size, offset):
+            """Determines whether or not the page starting at this offset,
+            which has this number of entries, is the last one to be
+            fetched. A page larger than requested means the server ignores
+            the count, and sent all entries."""
+            params, count = self._page_request(offset)
+            return count is None or size != count or \
+                    (self._limit is not None and offset + size >= self._limit)
+
+        @staticmethod
+        def _entry_key(entry):
+            """Return a key identifying an entry (or a dictionary from the
+            server reply) across pages."""
+            if isinstance(entry, dict):
+                return (utils.reply_userid(entry['author']),
+                        entry['id'])
+            return (entry.author.userid, entry.id)
+
+        def _accepts(self, entry):
+            """Filters out entries the server should not have sent."""
+            if self._since is None:
+                return True
+            elif isinstance(entry, dict):
+                return utils.parse_time(entry['updated']) > self._since
+            else:
+                return entry.updated_timestamp > self._since
+
+        def afetch(self, revalidate=False):
+            """Coroutine version of :py:meth:`fetch`. Entries are revalidated
+            concurrently.
+
+            Queries can also be iterated asynchronously
+            (``async for entry in query``).
+            It requires Python 3.5; see :py:mod:`wididit.aio`.
+            """
+            from wididit import aio
+            return aio.fetch(self, revalidate)
+
+        def __aiter__(self):
+            from wididit import aio
+            return aio.QueryIterator(self)
+
+        def _load_response(self, response, revalidate=False, raw=False):
             if response.status_code != requests.codes.ok:
                 raise exceptions.ServerException(response.status_code)
-            reply = self._server.unserialize(response.content)
-            entries = []
-            for data in reply:
-                entry = Entry(People.from_anything(data['author']), data['id'],
-                    initial_data=data)
-                entries.append(entry)
-            return entries
+            reply = self._server.unserialize_response(response)
+            if raw:
+                return reply
+            return [Entry.from_reply(data, revalidate) for data in reply]
+
+    class FederatedQuery(object):
+        """Get entries by some authors, from all the servers they are
+        registered on.
+
+        Servers are queried concurrently, and their results are merged in a
+        single stream ordered by time. Each server is expected to send its
+        own results in that order.
+
+        .. code-block:: python
+
+            query = FederatedQuery(['foo@example.com', 'bar@example.org'])
+            for entry in query.paginate(50).limit(200):
+                print(entry.title)
+            print(query.errors, query.timed_out)
+
+        :param authors: A list of valid representations of people.
+        :param order: The field results are ordered by, 'updated' or
+                      'published'.
+        :param newest_first: Determines whether or not the most recent
+                             results come first.
+        :param deadline: The maximum time (in seconds) to wait for a server
+                         to send its next result. Servers exceeding it are
+                         dropped from the results and listed in
+                         :py:attr:`timed_out`.
+        """
+        _end = object()
+
+        def __init__(self, authors, order='updated', newest_first=True,
+                deadline=10):
+            assert order in ('updated', 'published')
+            self._authors = {}
+            for author in authors:
+                author = People.from_anything(author)
+                self._authors.setdefault(author.server, []).append(author)
+            self._order = order
+            self._newest_first = newest_first
+            self._deadline = deadline
+            self._content = []
+            self._page_size = None
+            self._limit = None
+            self.errors = {}
+            """Exceptions raised by servers, by hostname."""
+            self.timed_out = []
+            """Hostnames of servers which exceeded the deadline."""
+
+        def filterContent(self, text):
+            """See :py:meth:`wididit.Entry.Query.filterContent`."""
+            self._content.append(text)
+            return self
+
+        def paginate(self, page_size):
+            """See :py:meth:`wididit.Entry.Query.paginate`."""
+            self._page_size = page_size
+            return self
+
+        def limit(self, count):
+            """See :py:meth:`wididit.Entry.Query.limit`. It applies to each
+            server as well as to the merged results."""
+            self._limit = count
+            return self
+
+        def fetch(self):
+            """Return all entries matching this query."""
+            return list(self)
+
+        def _queries(self):
+            for (server, authors) in self._authors.items():
+                query = Entry.Query(server, Entry.Query.MODE_ALL) \
+                        .paginate(self._page_size).limit(self._limit)
+                for author in authors:
+                    query.filterAuthor(author)
+                for text in self._content:
+                    query.filterContent(text)
+                yield query
+
+        def _run(self, query, results, stopped):
+            def put(item):
+                while not stopped.is_set():
+                    try:
+                        results.put(item, timeout=0.1)
+                        return True
+                    except queue.Full:
+                        pass
+                return False
+            try:
+                for entry in query:
+                    if not put(entry):
+                        return
+            except Exception as e:
+                put(e)
+            else:
+                put(self._end)
+
+        def _sort_key(self, entry):
+            key = getattr(entry, self._order + '_timestamp')
+            return -key if self._newest_first else key
+
+        def __iter__(self):
+            self.errors = {}
+            self.timed_out = []
+            stopped = threading.Event()
+            streams = []
+            for query in self._queries():
+                results = queue.Queue(maxsize=self._page_size or 0)
+                thread = threading.Thread(target=self._run,
+                        args=(query, results, stopped))
+                thread.daemon = True
+                thread.start()
+                streams.append((query._server.hostname, results))
+            heap = []
+            def pull(index, deadline):
+                (hostname, results) = streams[index]
+                try:
+                    entry = results.get(timeout=max(0, deadline - time.time()))
+                except queue.Empty:
+                    self.timed_out.append(hostname)
+                    return
+                if isinstance(entry, Exception):
+                    self.errors[hostname] = entry
+                elif entry is not self._end:
+                    heapq.heappush(heap, (self._sort_key(entry), index, entry))
+            try:
+                deadline = time.time() + self._deadline
+                for index in range(len(streams)):
+                    pull(index, deadline)
+                count = 0
+                while heap and (self._limit is None or count < self._limit):
+                    (key, index, entry) = heapq.heappop(heap)
+                    count += 1
+                    yield entry
+                    pull(index, time.time() + self._deadline)
+            finally:
+                stopped.set()
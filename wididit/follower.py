@@ -0,0 +1,259 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Following timelines, by polling servers for new entries.
+
+.. code-block:: python
+
+    def on_entries(entries):
+        for entry in entries:
+            print(entry.title)
+    follower = TimelineFollower(server, on_entries).start()
+
+Followers only ask for entries updated since the most recent one they have
+seen, and poll less and less often (up to `max_interval`) while their
+timeline does not change. New entries can also be read by iterating the
+follower, or asynchronously (``async for entry in follower``, see
+:py:mod:`wididit.aio`).
+
+All followers share a :py:class:`Scheduler` (and the connection pools of
+their servers), so following thousands of timelines only takes a few
+threads.
+"""
+
+import time
+import heapq
+import threading
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from wididit import Entry
+
+class Scheduler(object):
+    """Runs the polls of followers when they are due, in a pool of worker
+    threads.
+
+    :param workers: The number of polls run concurrently.
+    """
+    def __init__(self, workers=4):
+        self._heap = []
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._tasks = queue.Queue()
+        self.error = None
+        """The exception raised by the last call which failed, if any."""
+        self._threads = [threading.Thread(target=self._run_timer)] + \
+                [threading.Thread(target=self._run_worker)
+                        for x in range(workers)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def schedule(self, function, delay):
+        """Call this function in a worker thread after `delay` seconds."""
+        with self._condition:
+            self._counter += 1
+            heapq.heappush(self._heap,
+                    (time.time() + delay, self._counter, function))
+            self._condition.notify()
+
+    def __len__(self):
+        """Return the number of calls which are scheduled."""
+        return len(self._heap)
+
+    def _run_timer(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.time():
+                    timeout = self._heap[0][0] - time.time() \
+                            if self._heap else None
+                    self._condition.wait(timeout)
+                function = heapq.heappop(self._heap)[2]
+            self._tasks.put(function)
+
+    def _run_worker(self):
+        while True:
+            function = self._tasks.get()
+            try:
+                function()
+            except Exception as e:
+                # The worker is shared by other tasks, so it keeps running.
+                self.error = e
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+def get_default_scheduler():
+    """Return the scheduler shared by followers which are not given one."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = Scheduler()
+        return _default_scheduler
+
+class TimelineFollower(object):
+    """Polls a query for entries which were created or updated since the
+    previous poll.
+
+    :param server: The server to poll.
+    :param callback: A function called with the list of new entries after
+                     each poll finding some.
+    :param query: The :py:class:`wididit.Entry.Query` to poll. Defaults to
+                  the timeline of the user connected to the server.
+    :param min_interval: The time between polls (in seconds) while there are
+                         new entries.
+    :param max_interval: The maximum time between polls.
+    :param backoff: The factor the time between polls is multiplied by
+                    after each poll without new entries (or failing).
+    :param scheduler: The :py:class:`Scheduler` running the polls. Defaults
+                      to one shared by all followers.
+    """
+    def __init__(self, server, callback=None, query=None, min_interval=5,
+            max_interval=300, backoff=2, scheduler=None):
+        if query is None:
+            query = Entry.Query(server, Entry.Query.MODE_TIMELINE)
+        self._query = query
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._listeners = []
+        if callback is not None:
+            self._listeners.append(callback)
+        self._running = False
+        self._cursor = None
+        self._seen = {}
+        """Maps the EntryIDs of the entries updated during the second of the
+        cursor to their update time."""
+        self.interval = min_interval
+        """The time until the next poll, in seconds."""
+        self.error = None
+        """The exception raised by the last poll (or by a callback), if it
+        failed."""
+
+    @property
+    def cursor(self):
+        """The update time (as a timestamp) of the most recent entry seen."""
+        return self._cursor
+
+    def add_callback(self, callback):
+        """Call this function with the list of new entries after each poll
+        finding some."""
+        self._listeners.append(callback)
+
+    def remove_callback(self, callback):
+        """Stop calling this function after polls."""
+        self._listeners.remove(callback)
+
+    def start(self):
+        """Start polling (in the scheduler) and return the follower."""
+        with self._lock:
+            if not self._running:
+                self._running = True
+                if self._scheduler is None:
+                    self._scheduler = get_default_scheduler()
+                self._scheduler.schedule(self._run, 0)
+        return self
+
+    def stop(self):
+        """Stop polling. A poll which is running is still delivered."""
+        with self._lock:
+            self._running = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        if not self._running:
+            return
+        try:
+            self.poll()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._lock:
+                if self._running:
+                    self._scheduler.schedule(self._run, self.interval)
+
+    def poll(self):
+        """Fetch the entries which are new since the previous poll, deliver
+        them, and return them.
+
+        Entries updated during the second of the most recent entry seen are
+        asked again, and filtered out if they were already delivered.
+        All callbacks are called, even if one of them raises an exception;
+        the first one is raised again afterwards."""
+        query = self._query
+        if self._cursor is not None:
+            # A copy, not to change the query given by the caller.
+            query = query.copy().since(self._cursor - 1)
+        try:
+            entries = [x for x in query.fetch()
+                    if self._seen.get(x.entryid) != x.updated_timestamp]
+        except Exception:
+            self._slow_down()
+            raise
+        self.error = None
+        if not entries:
+            self._slow_down()
+            return entries
+        self.interval = self._min_interval
+        for entry in entries:
+            updated = entry.updated_timestamp
+            if self._cursor is None or updated > self._cursor:
+                self._cursor = updated
+        self._seen = dict([(x, y) for (x, y) in self._seen.items()
+            if y >= self._cursor])
+        self._seen.update([(x.entryid, x.updated_timestamp) for x in entries
+            if x.updated_timestamp >= self._cursor])
+        errors = []
+        for listener in list(self._listeners):
+            try:
+                listener(entries)
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+        return entries
+
+    def _slow_down(self):
+        self.interval = min(self.interval * self._backoff, self._max_interval)
+
+    def __iter__(self):
+        """Yield new entries as they are found. The follower should be
+        started."""
+        entries = queue.Queue()
+        self.add_callback(entries.put)
+        try:
+            while True:
+                for entry in entries.get():
+                    yield entry
+        finally:
+            self.remove_callback(entries.put)
+
+    def __aiter__(self):
+        from wididit import aio
+        return aio.FollowerIterator(self)
@@ -29,12 +29,12 @@ if 'unittest' in sys.modules:
 else:
     try:
         _trans = gettext.translation('wididit-python')
-        _ = _trans.ugettext
+        _ = getattr(_trans, 'ugettext', _trans.gettext)
     except:
         try:
             path = os.path.join(sys.prefix, 'local', 'share', 'locale')
             _trans = gettext.translation('wididit-python', localedir=path)
-            _ = _trans.ugettext
+            _ = getattr(_trans, 'ugettext', _trans.gettext)
         except:
             _ = lambda x:x
 
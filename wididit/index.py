@@ -0,0 +1,244 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""In-memory inverted index of entries, for searches which do not need the
+server.
+
+.. code-block:: python
+
+    index = EntryIndex()
+    index.add(Entry.Query(server, Entry.Query.MODE_ALL).fetch())
+    index.search(content=['lol test'], tags=['#wididit'])
+    index.search_query(
+            Entry.Query(server).filterAuthor('ProgVal@example.com'))
+
+Searches return EntryIDs (see :py:attr:`wididit.Entry.entryid`), most
+recently updated first. Content is matched word by word, regardless of case:
+all words of all texts must be in an entry (like several calls to
+:py:meth:`wididit.Entry.Query.filterContent`), and an entry may be written by
+any of the authors (like several calls to
+:py:meth:`wididit.Entry.Query.filterAuthor`). A tag matches entries having it
+or any tag below it in its :ref:`concepts-tag-trees` (``#spam`` matches
+``#spam#egg``).
+"""
+
+import re
+import json
+import threading
+
+from wididit import utils
+from wididit import People, Entry
+
+_word_regexp = re.compile(r'\w+', re.UNICODE)
+_empty = frozenset()
+
+def _words(text):
+    return frozenset(_word_regexp.findall(text.lower()))
+
+def _tag_path(tag):
+    """Return the names of the tags of the path of a tag, in a tree."""
+    return tuple([x for x in tag.split('#') if x])
+
+def _tag_prefixes(content):
+    """Return the paths of the tags of a text, and of their ancestors."""
+    prefixes = set()
+    for tag in utils.get_tags(content):
+        path = _tag_path(tag)
+        for index in range(1, len(path) + 1):
+            prefixes.add(path[:index])
+    return frozenset(prefixes)
+
+class EntryIndex(object):
+    """An inverted index of the content, tags and authors of entries.
+
+    Adding an entry which is already indexed updates it.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+        """Maps EntryIDs to (author, updated, words, tags) tuples."""
+        self._words = {}
+        self._tags = {}
+        self._authors = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, entry):
+        return self._entryid(entry) in self._entries
+
+    @staticmethod
+    def _entryid(entry):
+        """Return the EntryID of an Entry, of a dictionary from a server
+        reply, or of an EntryID."""
+        if isinstance(entry, Entry):
+            return entry.entryid
+        elif isinstance(entry, dict):
+            return '%s/%s' % (utils.reply_userid(entry['author']),
+                    entry['id'])
+        return entry
+
+    def add(self, entries):
+        """Index entries, or index them again if they changed.
+
+        :param entries: An iterable of Entry instances, or of dictionaries
+                        from server replies.
+        """
+        for entry in entries:
+            if isinstance(entry, Entry):
+                author = entry.author.userid
+                entryid = entry.entryid
+                updated = entry.updated_timestamp
+                content = entry.content
+            else:
+                author = utils.reply_userid(entry['author'])
+                entryid = '%s/%s' % (author, entry['id'])
+                updated = utils.parse_time(entry['updated'])
+                content = entry['content']
+            record = (author, updated, _words(content),
+                    _tag_prefixes(content))
+            with self._lock:
+                self._remove(entryid)
+                self._insert(entryid, record)
+
+    def _insert(self, entryid, record):
+        self._entries[entryid] = record
+        self._authors.setdefault(record[0], set()).add(entryid)
+        for word in record[2]:
+            self._words.setdefault(word, set()).add(entryid)
+        for tag in record[3]:
+            self._tags.setdefault(tag, set()).add(entryid)
+
+    def remove(self, entry):
+        """Remove an entry from the index.
+
+        :param entry: An Entry instance, a dictionary from a server reply, or
+                      an EntryID.
+        """
+        with self._lock:
+            self._remove(self._entryid(entry))
+
+    def _remove(self, entryid):
+        record = self._entries.pop(entryid, None)
+        if record is None:
+            return
+        self._discard(self._authors, record[0], entryid)
+        for word in record[2]:
+            self._discard(self._words, word, entryid)
+        for tag in record[3]:
+            self._discard(self._tags, tag, entryid)
+
+    @staticmethod
+    def _discard(postings, key, entryid):
+        entryids = postings[key]
+        entryids.discard(entryid)
+        if not entryids:
+            del postings[key]
+
+    def search(self, content=(), authors=(), tags=(), since=None,
+            limit=None):
+        """Return the EntryIDs of the entries matching all these criteria,
+        most recently updated first.
+
+        :param content: A list of texts the entries contain.
+        :param authors: A list of valid representations of people. Entries
+                        written by any of them match.
+        :param tags: A list of tags, such as ``'#spam#egg'``.
+        :param since: Only match entries updated after this timestamp.
+        :param limit: The maximum number of results.
+        """
+        with self._lock:
+            sets = []
+            for text in content:
+                sets.extend([self._words.get(x, _empty) for x in _words(text)])
+            for tag in tags:
+                sets.append(self._tags.get(_tag_path(tag), _empty))
+            if authors:
+                entryids = set()
+                for author in authors:
+                    userid = People.from_anything(author).userid
+                    entryids.update(self._authors.get(userid, _empty))
+                sets.append(entryids)
+            if sets:
+                sets.sort(key=len)
+                results = set(sets[0])
+                for entryids in sets[1:]:
+                    if not results:
+                        break
+                    results.intersection_update(entryids)
+            else:
+                results = self._entries.keys()
+            updated = dict([(x, self._entries[x][1]) for x in results])
+        if since is not None:
+            updated = dict([(x, y) for (x, y) in updated.items() if y > since])
+        results = sorted(updated, key=updated.get, reverse=True)
+        return results if limit is None else results[:limit]
+
+    def search_query(self, query):
+        """Return the EntryIDs of the indexed entries matching the filters of
+        this query (content, authors, since and limit), without any request
+        to the server.
+
+        :param query: A :py:class:`wididit.Entry.Query`.
+        """
+        return self.search(content=query._params.get('content', ()),
+                authors=query._params.get('author', ()),
+                since=query._since, limit=query._limit)
+
+    def tags(self, prefix=''):
+        """Return the tags below this one (or all tags) and the number of
+        entries having them, as a dict.
+
+        :param prefix: A tag, such as ``'#spam'``.
+        """
+        path = _tag_path(prefix)
+        with self._lock:
+            return dict([('#' + '#'.join(x), len(y))
+                    for (x, y) in self._tags.items()
+                    if x[:len(path)] == path and len(x) > len(path)])
+
+    def save(self, path):
+        """Write the index to a file, as JSON.
+
+        :param path: The path of the file.
+        """
+        with self._lock:
+            # Only the entries are stored; the other mappings are rebuilt
+            # from them by load().
+            data = json.dumps(dict([(entryid, [author, updated,
+                        sorted(words), sorted([list(x) for x in tags])])
+                    for (entryid, (author, updated, words, tags))
+                    in self._entries.items()]))
+        with open(path, 'wb') as fd:
+            fd.write(data.encode('utf8'))
+
+    @classmethod
+    def load(cls, path):
+        """Return an index read from a file written by :py:meth:`save`.
+
+        :param path: The path of the file.
+        """
+        index = cls()
+        with open(path, 'rb') as fd:
+            data = json.loads(fd.read().decode('utf8'))
+        for (entryid, (author, updated, words, tags)) in data.items():
+            index._insert(entryid, (author, updated, frozenset(words),
+                    frozenset([tuple(x) for x in tags])))
+        return index
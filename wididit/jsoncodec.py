@@ -0,0 +1,215 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Registry of JSON libraries used to talk to servers.
+
+The fastest library installed is selected (and imported) when it is first
+needed; the standard :py:mod:`json` module is always available. A codec
+can also be chosen for all servers with :py:func:`set_default`, or for a
+single server:
+
+.. code-block:: python
+
+    server = Server('example.com', codec='json')
+"""
+
+import json
+import codecs
+import collections
+
+class Codec(object):
+    """A JSON library.
+
+    :param name: The name of the codec.
+    :param loads: A function decoding JSON from bytes (or strings).
+    :param dumps: A function encoding data to JSON, as bytes or string.
+    """
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return 'wididit.jsoncodec.Codec(%r)' % self.name
+
+_factories = collections.OrderedDict()
+
+def register(name, factory):
+    """Register a codec. Codecs registered first are preferred.
+
+    :param name: The name of the codec.
+    :param factory: A function returning the :py:class:`Codec`; it should
+                    raise ImportError if the library is not installed.
+    """
+    _factories[name] = factory
+    _codecs.pop(name, None)
+
+def unregister(name):
+    """Remove a codec from the registry.
+
+    :param name: The name of the codec.
+    """
+    global _default
+    del _factories[name]
+    codec = _codecs.pop(name, None)
+    if codec is not None and codec is _default:
+        _default = None
+
+_codecs = {}
+_default = None
+
+def get_codec(name=None):
+    """Return a codec.
+
+    :param name: The name of the codec, or None for the default one. Codec
+                 instances are returned as they are.
+    """
+    if name is None:
+        return get_default()
+    elif isinstance(name, Codec):
+        return name
+    if name not in _codecs:
+        _codecs[name] = _factories[name]()
+    return _codecs[name]
+
+def available():
+    """Return the names of the installed codecs, preferred ones first."""
+    names = []
+    for name in _factories:
+        try:
+            get_codec(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+def get_default():
+    """Return the codec used by servers which do not have their own one:
+    the one given to :py:func:`set_default`, or the preferred installed
+    one."""
+    global _default
+    if _default is None:
+        for name in list(_factories):
+            try:
+                _default = get_codec(name)
+            except ImportError:
+                continue
+            break
+    return _default
+
+def set_default(name):
+    """Set the codec used by servers which do not have their own one.
+
+    :param name: The name of the codec, or a Codec instance. None selects
+                 the preferred installed one.
+    """
+    global _default
+    _default = None if name is None else get_codec(name)
+
+def _orjson():
+    import orjson
+    return Codec('orjson', orjson.loads, orjson.dumps)
+register('orjson', _orjson)
+
+def _ujson():
+    import ujson
+    return Codec('ujson', ujson.loads, ujson.dumps)
+register('ujson', _ujson)
+
+def _simplejson():
+    import simplejson
+    return Codec('simplejson', simplejson.loads, simplejson.dumps)
+register('simplejson', _simplejson)
+
+def _json():
+    try:
+        json.loads(b'[]')
+        loads = json.loads
+    except TypeError: # Python 3 before 3.6
+        def loads(data):
+            if isinstance(data, bytes):
+                data = data.decode('utf8')
+            return json.loads(data)
+    return Codec('json', loads, json.dumps)
+register('json', _json)
+
+_decoder = json.JSONDecoder()
+_whitespace = json.decoder.WHITESPACE
+_START, _FIRST, _VALUE, _NEXT = range(4)
+
+def iter_array(chunks):
+    """Decode a JSON array incrementally, and yield its elements as soon as
+    they are complete. Only the current element and the chunk being read are
+    kept in memory.
+
+    :param chunks: An iterable of bytes (or strings), such as
+                   ``response.iter_content(chunk_size)``.
+    :raises ValueError: if the data is not a valid JSON array.
+    """
+    chunks = iter(chunks)
+    decode = codecs.getincrementaldecoder('utf8')().decode
+    buffer = ''
+    position = 0
+    exhausted = False
+    state = _START
+    while True:
+        position = _whitespace.match(buffer, position).end()
+        if position < len(buffer):
+            char = buffer[position]
+            if state == _START:
+                if char != '[':
+                    raise ValueError('Expected a JSON array.')
+                state = _FIRST
+                position += 1
+                continue
+            elif char == ']' and state in (_FIRST, _NEXT):
+                return
+            elif state == _NEXT:
+                if char != ',':
+                    raise ValueError("Expected ',' or ']' in JSON array.")
+                state = _VALUE
+                position += 1
+                continue
+            try:
+                value, end = _decoder.raw_decode(buffer, position)
+            except ValueError:
+                if exhausted:
+                    raise
+            else:
+                # Wait for the separator, as the value may be a truncated
+                # number.
+                separator = _whitespace.match(buffer, end).end()
+                if exhausted or (separator < len(buffer) and
+                        buffer[separator] in ',]'):
+                    position = end
+                    state = _NEXT
+                    yield value
+                    continue
+        if exhausted:
+            raise ValueError('Unexpected end of JSON array.')
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            chunk = b''
+            exhausted = True
+        if isinstance(chunk, bytes):
+            chunk = decode(chunk, exhausted)
+        buffer = buffer[position:] + chunk
+        position = 0
@@ -0,0 +1,225 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Instrumentation of the requests sent to servers.
+
+Observers are notified when requests start and end:
+
+.. code-block:: python
+
+    metrics = Metrics()
+    server.add_observer(metrics)
+    ...
+    print(metrics.snapshot()['PUT /entry/{userid}/{id}/']['count'])
+
+Any object with the methods of :py:class:`RequestObserver` can be an
+observer. They are called in the thread sending the request, so they should
+be fast.
+"""
+
+import re
+import threading
+import timeit
+import collections
+
+_userid_regexp = re.compile(r'^[^/@]+@[^/@]+$')
+
+def path_template(path):
+    """Return the template of a path of the API, with userids and IDs
+    replaced by ``{userid}`` and ``{id}``, such as ``/entry/{userid}/{id}/``.
+    """
+    segments = path.split('/')
+    for (index, segment) in enumerate(segments):
+        if _userid_regexp.match(segment):
+            segments[index] = '{userid}'
+        elif segment.isdigit():
+            segments[index] = '{id}'
+    return '/'.join(segments)
+
+class RequestEvent(object):
+    """A request to a server.
+
+    Attributes set when the request ends are None until then.
+    """
+    __slots__ = ('hostname', 'method', 'path', 'template', 'started',
+            'duration', 'status', 'bytes', 'cache', 'error')
+
+    def __init__(self, hostname, method, path):
+        self.hostname = hostname
+        """The hostname of the server."""
+        self.method = method
+        """The HTTP method, such as 'GET'."""
+        self.path = path
+        """The path of the request, relative to the API base."""
+        self.template = path_template(path)
+        """The template of the path (see :py:func:`path_template`)."""
+        self.started = timeit.default_timer()
+        self.duration = None
+        """The time the request took, in seconds."""
+        self.status = None
+        """The status code of the response."""
+        self.bytes = None
+        """The size of the content of the response, if it is known."""
+        self.cache = None
+        """'hit' if the response came from the cache of the server,
+        'coalesced' if it was shared with an identical request in flight,
+        'miss' if it was not in the cache, None if the server has no
+        cache."""
+        self.error = None
+        """The exception raised by the request, if it failed."""
+
+    @property
+    def revalidated(self):
+        """Whether the server replied the object did not change since the
+        previous sync."""
+        return self.status == 304
+
+    def __repr__(self):
+        return '<RequestEvent %s %s %s>' % (self.method, self.template,
+                self.status)
+
+class RequestObserver(object):
+    """Base class of observers, which do nothing."""
+    def request_started(self, event):
+        """Called before sending the request.
+
+        :param event: The :py:class:`RequestEvent` of the request."""
+        pass
+
+    def request_finished(self, event):
+        """Called once the request succeeded or failed.
+
+        :param event: The :py:class:`RequestEvent` of the request."""
+        pass
+
+class _Endpoint(object):
+    """Aggregated statistics of the requests to an endpoint."""
+    def __init__(self, buckets):
+        self.count = 0
+        self.errors = 0
+        self.statuses = collections.Counter()
+        self.bytes = 0
+        self.cache_hits = 0
+        self.revalidated = 0
+        self.histogram = [0] * (len(buckets) + 1)
+        self.total = 0.
+        self.min = None
+        self.max = None
+
+class Metrics(RequestObserver):
+    """An observer keeping a histogram of the durations of requests, and
+    counters, for each endpoint (method and path template).
+
+    :param buckets: The upper bounds of the buckets of the histograms, in
+                    seconds.
+    """
+    buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+            2.5, 5, 10, 30)
+    """Default upper bounds of the buckets of the histograms, in seconds."""
+
+    def __init__(self, buckets=None):
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def request_finished(self, event):
+        key = '%s %s' % (event.method, event.template)
+        duration = event.duration
+        bucket = 0
+        for bound in self.buckets:
+            if duration <= bound:
+                break
+            bucket += 1
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = _Endpoint(self.buckets)
+            endpoint.count += 1
+            if event.error is not None:
+                endpoint.errors += 1
+            else:
+                endpoint.statuses[event.status] += 1
+            endpoint.bytes += event.bytes or 0
+            endpoint.cache_hits += event.cache == 'hit'
+            endpoint.revalidated += event.revalidated
+            endpoint.histogram[bucket] += 1
+            endpoint.total += duration
+            if endpoint.min is None or duration < endpoint.min:
+                endpoint.min = duration
+            if endpoint.max is None or duration > endpoint.max:
+                endpoint.max = duration
+
+    def reset(self):
+        """Forget all requests."""
+        with self._lock:
+            self._endpoints = {}
+
+    def snapshot(self, reset=False):
+        """Return the statistics of each endpoint, as a dict of
+        dicts which can be serialized in JSON, such as:
+
+        .. code-block:: python
+
+            {'GET /people/{userid}/': {
+                'count': 3, 'errors': 0, 'status': {200: 2, 304: 1},
+                'bytes': 1024, 'cache_hits': 0, 'revalidated': 1,
+                'duration': {'total': 0.12, 'mean': 0.04, 'min': 0.01,
+                             'max': 0.08, 'p50': 0.05, 'p90': 0.1,
+                             'p99': 0.1, 'buckets': [[0.001, 0], ...,
+                             [None, 0]]}}}
+
+        Percentiles are the upper bounds of the buckets they fall in (or the
+        maximum). The last bucket has no upper bound.
+
+        :param reset: Determines whether or not statistics are reset.
+        """
+        with self._lock:
+            endpoints = self._endpoints
+            if reset:
+                self._endpoints = {}
+            return dict([(key, self._export(endpoint))
+                for (key, endpoint) in endpoints.items()])
+
+    def _export(self, endpoint):
+        bounds = list(self.buckets) + [None]
+        duration = {
+                'total': endpoint.total,
+                'mean': endpoint.total / endpoint.count,
+                'min': endpoint.min,
+                'max': endpoint.max,
+                'buckets': [list(x) for x in zip(bounds, endpoint.histogram)],
+                }
+        for (name, quantile) in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            cumulated = 0
+            for (bound, count) in zip(bounds, endpoint.histogram):
+                cumulated += count
+                if cumulated >= quantile * endpoint.count:
+                    break
+            duration[name] = endpoint.max if bound is None else \
+                    min(bound, endpoint.max)
+        return {'count': endpoint.count,
+                'errors': endpoint.errors,
+                'status': dict(endpoint.statuses),
+                'bytes': endpoint.bytes,
+                'cache_hits': endpoint.cache_hits,
+                'revalidated': endpoint.revalidated,
+                'duration': duration,
+                }
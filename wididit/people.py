@@ -37,19 +37,29 @@ class People(WididitObject):
                     as this user.
     :param register: Determines whether or not we will create this user in
                     the server database.
+    :param sync: Determines whether or not the user is fetched from the
+                 server right now. If False, it will be fetched when needed.
+
+    There is only one instance for each (username, hostname) pair; calling
+    the constructor again only updates the password and the connection
+    if they are given.
     """
+    _singleton = True
+    __slots__ = ('_username', '_password', '_server', '_biography',
+            '_validators')
     def __new__(cls, username, hostname, *args, **kwargs):
         assert None not in (username, hostname)
         return super(People, cls).__new__(cls, username, hostname)
 
     def __init__(self, username, hostname, password=None, email=None,
-            connect=False, register=False):
+            connect=False, register=False, sync=False):
         super(People, self).__init__()
-        self._username = username
-        self._password = password
+        self._username = utils.intern_string(username)
+        if password is not None or not hasattr(self, '_password'):
+            self._password = password
         if connect:
             self._server = Server(hostname, self)
-        else:
+        elif not hasattr(self, '_server'):
             self._server = Server(hostname)
         if register:
             if email is None:
@@ -64,43 +74,65 @@ class People(WididitObject):
             if response.status_code != requests.codes.created:
                 raise exceptions.ServerException(response.status_code)
 
-        self.sync()
+        if sync:
+            self.sync()
 
     @staticmethod
-    def from_anything(data):
+    def from_anything(data, sync=False):
         """Return a People instance from any supported representation.
 
         Supported representation are People instances, userid strings,
         (username, hostname) tuples, and dictionnaries from server reply.
 
         :param data: A representation of a People object.
+        :param sync: Determines whether or not the user is fetched from the
+                     server right now. If False, it will be fetched when
+                     needed.
         """
         if isinstance(data, People):
             return data
-        elif isinstance(data, str) or isinstance(data, unicode):
+        elif isinstance(data, utils.string_types):
             try:
                 username, hostname = utils.userid2tuple(data)
             except ValueError:
                 raise exceptions.PeopleNotInstanciable(
                         _('hostname is missing.'))
-            return People(username, hostname)
+            return People(username, hostname, sync=sync)
         elif isinstance(data, tuple) and len(data) == 2:
-            return People(*data)
+            return People(*data, sync=sync)
         elif isinstance(data, dict) and 'username' in data and \
                 'server' in data and isinstance(data['server'], dict) and \
                 'hostname' in data['server']:
-            return People(data['username'], data['server']['hostname'])
+            people = People(data['username'], data['server']['hostname'],
+                    sync=sync and 'biography' not in data)
+            if 'biography' in data:
+                people._biography = data['biography']
+            return people
         else:
             raise ValueError('Invalid representation of People object: %r' %
                     data)
 
     def _sync(self):
-        response = self.server.get(self.api_path)
-        if response.status_code == requests.codes.not_found:
+        self._load_response(self.server.get(self.api_path,
+            headers=self._conditional_headers()))
+
+    def async_sync(self):
+        """Coroutine version of :py:meth:`sync`.
+
+        It requires Python 3.5; see :py:mod:`wididit.aio`."""
+        from wididit import aio
+        return aio.sync(self, self.server)
+
+    def _load_response(self, response):
+        if response.status_code == requests.codes.not_modified:
+            self.server._count('revalidated')
+            return
+        elif response.status_code == requests.codes.not_found:
             raise exceptions.NotFound(_('user %s') % self.userid)
         elif response.status_code != requests.codes.ok:
             raise exceptions.ServerException(response.status_code)
-        response = self.server.unserialize(response.content)
+        self._store_validators(response)
+        response = self.server.unserialize_response(response)
         self._biography = response['biography']
 
     @property
@@ -141,6 +173,8 @@ class People(WididitObject):
             'The password of the user.')
 
     def get_biography(self):
+        if not hasattr(self, '_biography'):
+            self._sync()
         return self._biography
     def set_biography(self, value):
         response = self.server.put(self.api_path, data={
@@ -18,33 +18,168 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-import json
+import time
 import base64
+import random
+import timeit
 import requests
+import threading
+import collections
+from requests.compat import cookielib
 
 
 import wididit
+from wididit import utils
+from wididit import metrics
+from wididit import breaker
+from wididit import jsoncodec
 from wididit.i18n import _
 from wididit import exceptions
 from wididit.wididitobject import WididitObject
 
 
+class _CodecFunction(object):
+    """Function of the JSON codec of a server; it can be used on the class
+    (with the default codec) or on an instance (with its own codec)."""
+    def __init__(self, name, doc):
+        self._name = name
+        self.__doc__ = doc
+
+    def __get__(self, instance, owner):
+        codec = (owner if instance is None else instance).codec
+        return getattr(jsoncodec.get_codec(codec), self._name)
+
+class _Flight(object):
+    """A GET request in flight, whose response is shared by identical
+    requests."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
 class RealServer(WididitObject):
     """Representation of a Wididit server.
 
+    All instances bound to the same hostname share a single pool of
+    keep-alive HTTP connections. The pool is created on the first request,
+    with the settings of the instance performing it.
+
+    There is one instance for each hostname and user it is connected as.
+    Instances of the same hostname share their settings, stats and
+    observers; calling the constructor again only updates the settings that
+    are given.
+
     :param hostname: The hostname of the server.
+    :param connect_as: The People instance used to authenticate.
+    :param pool_size: The maximum number of connections kept alive to this
+                      server.
+    :param pool_block: Determines whether or not a request waits for a free
+                       connection when the pool is full (instead of opening
+                       a throw-away one).
+    :param timeout: The default timeout of requests, in seconds.
+    :param cache: A :py:class:`wididit.cache.Cache` instance used to store
+                  responses to GET requests.
+    :param codec: The name of the JSON library used to talk to the server
+                  (see :py:mod:`wididit.jsoncodec`), or a
+                  :py:class:`wididit.jsoncodec.Codec` instance.
+    :param retries: The number of times GET, PUT and DELETE requests are
+                    sent again if the server cannot be reached.
+    :param retry_backoff: The maximum delay before the first retry, in
+                          seconds. It doubles for each retry, and the actual
+                          delay is random.
     """
-    def __new__(cls, hostname, *args, **kwargs):
-        return super(RealServer, cls).__new__(cls, hostname)
+    pool_size = 10
+    """Default maximum number of connections kept alive to a server."""
+    pool_block = False
+    """Default behavior when the connection pool is full."""
+    timeout = 30
+    """Default timeout of requests, in seconds."""
+    cache = None
+    """Default cache of responses (None means no cache)."""
+    codec = None
+    """Default JSON codec (None means the one returned by
+    :py:func:`wididit.jsoncodec.get_default`)."""
+    retries = 0
+    """Default number of retries of idempotent requests."""
+    retry_backoff = 0.1
+    """Default maximum delay before the first retry, in seconds."""
+    retry_backoff_max = 5
+    """Maximum delay between two retries, in seconds."""
+    breaker_threshold = 5
+    """Number of consecutive connection failures after which requests to a
+    server fail immediately, until it answers a probe again (see
+    :py:mod:`wididit.breaker`). None disables it. Like the connection pool,
+    the breaker of a hostname is created with the settings of the instance
+    sending the first request."""
+    breaker_recovery_time = 30
+    """Time between probes of a server which cannot be reached, in
+    seconds."""
+    coalesce = True
+    """Determines whether or not identical GET requests sent while one of
+    them is in flight share its response."""
+
+    _singleton = True
+    # Servers hold their settings, observers and stats, so they are never
+    # freed; there are only a few of them.
+    _strong_cache_size = None
+    __slots__ = ('_connected_as', '__dict__')
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    _flights_lock = threading.Lock()
 
-    def __init__(self, hostname, connect_as=None, **kwargs):
+    def __new__(cls, hostname, connect_as=None, *args, **kwargs):
+        if connect_as is None:
+            return super(RealServer, cls).__new__(cls, hostname)
+        return super(RealServer, cls).__new__(cls, hostname,
+                connect_as.username)
+
+    def __init__(self, hostname, connect_as=None, pool_size=None,
+            pool_block=None, timeout=None, cache=None, codec=None,
+            retries=None, retry_backoff=None, **kwargs):
         super(RealServer, self).__init__(**kwargs)
-        self._hostname = hostname
-        self.connected_as = connect_as
+        if connect_as is not None:
+            # Only the user is specific to this instance; everything else is
+            # stored by the anonymous instance of the hostname.
+            self.__dict__ = type(self)(hostname).__dict__
+        self._connected_as = connect_as
+        self._hostname = utils.intern_string(hostname)
+        if pool_size is not None:
+            self.pool_size = pool_size
+        if pool_block is not None:
+            self.pool_block = pool_block
+        if timeout is not None:
+            self.timeout = timeout
+        if cache is not None:
+            self.cache = cache
+        if codec is not None:
+            self.codec = jsoncodec.get_codec(codec)
+        if retries is not None:
+            self.retries = retries
+        if retry_backoff is not None:
+            self.retry_backoff = retry_backoff
+        if not hasattr(self, 'stats'):
+            self.stats = collections.Counter()
+            """Counters of events on this server, such as 'revalidated'
+            (syncs of objects which did not change since the previous
+            one), 'cache_hits', 'retries', 'short_circuited' (requests
+            which failed at once, as the server could not be reached) and
+            'coalesced' (requests which shared the response of an identical
+            one)."""
+        if not hasattr(self, '_observers'):
+            self._observers = []
+        if not hasattr(self, '_flights'):
+            self._flights = {}
 
     def __repr__(self):
         return "wididit.server.Server('%s')" % self.hostname
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def _sync(self):
         pass
 
@@ -64,16 +199,11 @@ class RealServer(WididitObject):
         """
         self._api_base = value
 
-    def get_connected_as(self):
+    @property
+    def connected_as(self):
+        """The People instance used to authenticate to the server, as given
+        to the constructor."""
         return self._connected_as
-    def set_connected_as(self, value):
-        self._connected_as = value
-    def del_connected_as(self):
-        self._connected_as = None
-    connected_as = property(get_connected_as, set_connected_as,
-            del_connected_as,
-            'The People instance used to connect to authenticate to the '
-            'server.')
 
     @property
     def whoami(self):
@@ -82,7 +212,7 @@ class RealServer(WididitObject):
         response = self.get('/whoami/')
         if response.status_code != 200:
             return None
-        reply = self.unserialize(response.content)
+        reply = self.unserialize_response(response)
         return '%s@%s' % (reply['username'], reply['server']['hostname'])
 
     @property
@@ -101,22 +231,223 @@ class RealServer(WididitObject):
         kwargs['auth'] = self._auth
         return kwargs
 
+    def add_observer(self, observer):
+        """Notify this observer of the start and the end of each request to
+        the server (see :py:mod:`wididit.metrics`)."""
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        """Stop notifying this observer."""
+        self._observers.remove(observer)
+
+    def _start(self, method, url):
+        """Notify observers a request starts, and return its event (or None
+        if there are no observers)."""
+        if not self._observers:
+            return None
+        event = metrics.RequestEvent(self.hostname, method, url)
+        for observer in self._observers:
+            observer.request_started(event)
+        return event
+
+    def _finish(self, event, response=None, error=None, cache=None,
+            stream=False):
+        """Notify observers a request ended."""
+        if event is None:
+            return
+        event.duration = timeit.default_timer() - event.started
+        event.error = error
+        event.cache = cache
+        if response is not None:
+            event.status = getattr(response, 'status_code', None)
+            if stream:
+                length = response.headers.get('Content-Length')
+                event.bytes = int(length) if length else None
+            elif getattr(response, 'content', None) is not None:
+                event.bytes = len(response.content)
+        for observer in self._observers:
+            observer.request_finished(event)
+
+    @property
+    def breaker(self):
+        """The :py:class:`wididit.breaker.CircuitBreaker` of this server, or
+        None if it is disabled."""
+        if self.breaker_threshold is None:
+            return None
+        return breaker.get_breaker(self.hostname, self._probe,
+                threshold=self.breaker_threshold,
+                recovery_time=self.breaker_recovery_time)
+
+    @property
+    def health(self):
+        """The state of the circuit breaker of this server, as a dict (see
+        :py:meth:`wididit.breaker.CircuitBreaker.health`)."""
+        breaker_ = self.breaker
+        if breaker_ is None:
+            return {'state': breaker.CLOSED}
+        return breaker_.health()
+
+    @classmethod
+    def _probe(cls, hostname):
+        # Breakers outlive the instances; probe with the current one.
+        cls(hostname)._get('/whoami/', auth=None)
+
+    def _retry_delay(self, attempt):
+        """Return the time to wait before this retry (counted from 1)."""
+        return random.uniform(0, min(self.retry_backoff_max,
+            self.retry_backoff * 2 ** (attempt - 1)))
+
+    def _send(self, event, function, url, kwargs, cache=None,
+            idempotent=True):
+        """Perform a request with this function, converting connection errors
+        and notifying observers of its end. Idempotent requests are retried
+        if the server cannot be reached."""
+        breaker_ = self.breaker
+        if breaker_ is not None and not breaker_.allow():
+            self._count('short_circuited')
+            error = exceptions.Unreachable(self.hostname)
+            self._finish(event, error=error, cache=cache)
+            raise error
+        attempt = 0
+        while True:
+            try:
+                response = function(url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                if idempotent and attempt < self.retries:
+                    attempt += 1
+                    self._count('retries')
+                    time.sleep(self._retry_delay(attempt))
+                    continue
+                if breaker_ is not None:
+                    breaker_.failure(e)
+                self._finish(event, error=e, cache=cache)
+                raise exceptions.Unreachable(self.hostname)
+            except Exception as e:
+                self._finish(event, error=e, cache=cache)
+                raise
+            break
+        if breaker_ is not None:
+            breaker_.success()
+        self._finish(event, response, cache=cache,
+                stream=kwargs.get('stream', False))
+        return response
+
+    def _count(self, name, value=1):
+        """Increment one of the :py:attr:`stats` counters."""
+        with self._stats_lock:
+            self.stats[name] += value
+
+    @property
+    def session(self):
+        """The ``requests`` session holding the connection pool to this
+        server."""
+        with self._sessions_lock:
+            if self.hostname not in self._sessions:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                        pool_maxsize=self.pool_size,
+                        pool_block=self.pool_block)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                # The session is used for all users of the hostname, so it
+                # must not send the cookies set for one of them.
+                session.cookies.set_policy(
+                        cookielib.DefaultCookiePolicy(allowed_domains=[]))
+                self._sessions[self.hostname] = session
+            return self._sessions[self.hostname]
+
+    def close(self):
+        """Close all connections to this server.
+
+        The connection pool is shared by all instances bound to this hostname,
+        and it will be opened again on the next request."""
+        with self._sessions_lock:
+            session = self._sessions.pop(self.hostname, None)
+        if session is not None:
+            session.close()
+
+    def _request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, self.api_base + url, **kwargs)
+
+    @staticmethod
+    def _flight_key(url, kwargs):
+        """Return the key of a GET request; identical requests (including
+        their authentication and headers) have the same key."""
+        params = tuple(sorted([(x, tuple(y) if isinstance(y, list) else y)
+                for (x, y) in (kwargs.get('params') or {}).items()]))
+        headers = tuple(sorted((kwargs.get('headers') or {}).items()))
+        return (url, params, kwargs.get('auth'), headers)
+
+    def _single_flight(self, key, function, event=None):
+        """Call the function, unless it is already being called with this
+        key; in that case, wait for that call and return its result (and
+        notify observers of the end of the request with this event)."""
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self._count('coalesced')
+            flight.done.wait()
+            self._finish(event, flight.response, error=flight.error,
+                    cache='coalesced')
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+        try:
+            flight.response = function()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.response
+
     def _get(self, url, **kwargs):
-        return requests.get(self.api_base + url, **kwargs)
+        return self._request('GET', url, **kwargs)
     def get(self, url, **kwargs):
         """Perform a GET request to the server.
 
+        Identical requests sent by several threads at the same time share
+        a single response (see :py:attr:`coalesce`), which should not be
+        modified.
+
         :param url: The URL to which perform the request
         :param **kwargs: Optional arguments that ``requests`` takes.
         """
         kwargs = self._auth_on_kwargs(kwargs)
-        try:
-            return self._get(url, **kwargs)
-        except requests.exceptions.ConnectionError:
-            raise exceptions.Unreachable(self.hostname)
+        event = self._start('GET', url)
+        cache = self.cache
+        if cache is not None:
+            key = cache.key(url, kwargs.get('params'), kwargs['auth'])
+            response = cache.get(key)
+            if response is not None:
+                self._count('cache_hits')
+                self._finish(event, response, cache='hit')
+                return response
+        def send():
+            response = self._send(event, self._get, url, kwargs,
+                    cache=None if cache is None else 'miss')
+            if cache is not None and not kwargs.get('stream'):
+                cache.set(key, url, response)
+            return response
+        if not self.coalesce or kwargs.get('stream'):
+            return send()
+        return self._single_flight(self._flight_key(url, kwargs), send,
+                event)
+
+    def _invalidate(self, url):
+        """Remove responses to requests to the collection of this URL
+        from the cache."""
+        if self.cache is not None:
+            self.cache.invalidate(url)
 
     def _post(self, url, **kwargs):
-        return requests.post(self.api_base + url, **kwargs)
+        return self._request('POST', url, **kwargs)
     def post(self, url, **kwargs):
         """Perform a POST request to the server.
 
@@ -125,12 +456,13 @@ class RealServer(WididitObject):
         """
         kwargs = self._auth_on_kwargs(kwargs)
         try:
-            return self._post(url, **kwargs)
-        except requests.exceptions.ConnectionError:
-            raise exceptions.Unreachable(self.hostname)
+            return self._send(self._start('POST', url), self._post, url,
+                    kwargs, idempotent=False)
+        finally:
+            self._invalidate(url)
 
     def _put(self, url, **kwargs):
-        return requests.put(self.api_base + url, **kwargs)
+        return self._request('PUT', url, **kwargs)
     def put(self, url, **kwargs):
         """Perform a PUT request to the server.
 
@@ -139,12 +471,13 @@ class RealServer(WididitObject):
         """
         kwargs = self._auth_on_kwargs(kwargs)
         try:
-            return self._put(url, **kwargs)
-        except requests.exceptions.ConnectionError:
-            raise exceptions.Unreachable(self.hostname)
+            return self._send(self._start('PUT', url), self._put, url,
+                    kwargs)
+        finally:
+            self._invalidate(url)
 
     def _delete(self, url, **kwargs):
-        return requests.delete(self.api_base + url, **kwargs)
+        return self._request('DELETE', url, **kwargs)
     def delete(self, url, **kwargs):
         """Perform a DELETE request to the server.
 
@@ -153,23 +486,39 @@ class RealServer(WididitObject):
         """
         kwargs = self._auth_on_kwargs(kwargs)
         try:
-            return self._delete(url, **kwargs)
-        except requests.exceptions.ConnectionError:
-            raise exceptions.Unreachable(self.hostname)
+            return self._send(self._start('DELETE', url), self._delete, url,
+                    kwargs)
+        finally:
+            self._invalidate(url)
 
-    @staticmethod
-    def serialize(data):
-        """Serialize data to be sent to the server.
+    def unserialize_response(self, response):
+        """Unserialize the content of a response. The result is kept with the
+        response, so callers sharing a response (see :py:meth:`get`) share
+        the result too; it should not be modified.
 
-        :param data: The data to be serialized."""
-        return json.dumps(data)
+        :param response: A response from the server."""
+        try:
+            return response._unserialized
+        except AttributeError:
+            pass
+        # setdefault is atomic, so all threads get the same lock.
+        lock = response.__dict__.setdefault('_unserialize_lock',
+                threading.Lock())
+        with lock:
+            if not hasattr(response, '_unserialized'):
+                response._unserialized = self.unserialize(response.content)
+        return response._unserialized
 
-    @staticmethod
-    def unserialize(data):
+    serialize = _CodecFunction('dumps',
+        """Serialize data to be sent to the server, as bytes or string.
+
+        :param data: The data to be serialized.""")
+
+    unserialize = _CodecFunction('loads',
         """Unserialize data from the server.
 
-        :param data: The data to be unserialized."""
-        return json.loads(data)
+        :param data: The data to be unserialized, preferably the raw bytes
+                     of the response.""")
 
 class FakeServer(RealServer):
     """Mocks a Wididit server (for testing purposes)."""
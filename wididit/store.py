@@ -0,0 +1,272 @@
+# Copyright (C) 2011, Valentin Lorentz
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Local mirror of entries and people, in a SQLite database.
+
+.. code-block:: python
+
+    store = SQLiteStore('wididit.sqlite')
+    query = Entry.Query(server, Entry.Query.MODE_ALL)
+    store.sync(server, query) # Only fetches entries newer than the last sync
+    for entry in store.fetch(Entry.Query(server).filterAuthor('ProgVal')):
+        print(entry.title)
+
+Offline queries do not need the server: the filters of the query
+(:py:meth:`wididit.Entry.Query.filterAuthor`,
+:py:meth:`wididit.Entry.Query.filterContent`,
+:py:meth:`wididit.Entry.Query.since` and
+:py:meth:`wididit.Entry.Query.limit`) are applied to the entries of the
+mirror, most recently updated first. Entries deleted from the server stay in
+the mirror.
+"""
+
+import json
+import sqlite3
+import threading
+
+from wididit import utils
+from wididit import People, Entry
+
+_schema = """
+CREATE TABLE IF NOT EXISTS people (
+    userid TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    hostname TEXT NOT NULL,
+    biography TEXT
+);
+CREATE TABLE IF NOT EXISTS entry (
+    author TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    content TEXT,
+    category TEXT,
+    contributors TEXT,
+    generator TEXT,
+    published INTEGER,
+    rights TEXT,
+    source TEXT,
+    subtitle TEXT,
+    summary TEXT,
+    title TEXT,
+    updated INTEGER,
+    PRIMARY KEY (author, id)
+);
+CREATE INDEX IF NOT EXISTS entry_author ON entry (author);
+CREATE INDEX IF NOT EXISTS entry_published ON entry (published);
+CREATE INDEX IF NOT EXISTS entry_updated ON entry (updated);
+CREATE TABLE IF NOT EXISTS sync (
+    query TEXT PRIMARY KEY,
+    updated INTEGER NOT NULL
+);
+"""
+
+_text_fields = ('content', 'category', 'generator', 'rights', 'source',
+        'subtitle', 'summary', 'title')
+_columns = ('author', 'id') + _text_fields + \
+        ('contributors', 'published', 'updated')
+
+class SQLiteStore(object):
+    """A local mirror of entries and people.
+
+    :param path: The path of the database file. Defaults to an in-memory
+                 database.
+    """
+    def __init__(self, path=':memory:'):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.executescript(_schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self):
+        """Return the number of entries in the mirror."""
+        return self._execute('SELECT COUNT(*) FROM entry')[0][0]
+
+    def _execute(self, statement, parameters=()):
+        with self._lock:
+            return self._connection.execute(statement, parameters).fetchall()
+
+    @staticmethod
+    def _row(entry):
+        """Return the row of an entry, from an Entry instance or a
+        dictionary from a server reply."""
+        if isinstance(entry, Entry):
+            entry = dict(entry.as_serializable, id=entry.id)
+        row = dict([(x, entry[x]) for x in _text_fields])
+        row['author'] = People.from_anything(entry['author']).userid
+        row['id'] = entry['id']
+        row['contributors'] = json.dumps([People.from_anything(x).userid
+                for x in entry['contributors']])
+        row['published'] = utils.parse_time(entry['published'])
+        row['updated'] = utils.parse_time(entry['updated'])
+        return tuple([row[x] for x in _columns])
+
+    def add(self, entries):
+        """Store entries and their authors, replacing older versions.
+
+        :param entries: An iterable of Entry instances, or of dictionaries
+                        from server replies.
+        """
+        rows = []
+        authors = {}
+        for entry in entries:
+            rows.append(self._row(entry))
+            author = entry.author if isinstance(entry, Entry) else \
+                    People.from_anything(entry['author'])
+            authors[author.userid] = author
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                        'INSERT OR REPLACE INTO entry (%s) VALUES (%s)' %
+                        (', '.join(_columns), ', '.join('?' * len(_columns))),
+                        rows)
+                self._add_people(authors.values())
+        return len(rows)
+
+    def add_people(self, people):
+        """Store people. Their biography is stored if it is already known,
+        without fetching it.
+
+        :param people: An iterable of valid representations of people.
+        """
+        people = [People.from_anything(x) for x in people]
+        with self._lock:
+            with self._connection:
+                self._add_people(people)
+
+    def _add_people(self, people):
+        for person in people:
+            biography = getattr(person, '_biography', None)
+            self._connection.execute('INSERT OR IGNORE INTO people '
+                    '(userid, username, hostname) VALUES (?, ?, ?)',
+                    (person.userid, person.username, person.server.hostname))
+            if biography is not None:
+                self._connection.execute('UPDATE people SET biography = ? '
+                        'WHERE userid = ?', (biography, person.userid))
+
+    def get_people(self, userid):
+        """Return a People instance from the mirror, with its biography if it
+        is known, or None.
+
+        :param userid: The userid of the people.
+        """
+        rows = self._execute('SELECT username, hostname, biography '
+                'FROM people WHERE userid = ?', (userid,))
+        if not rows:
+            return None
+        username, hostname, biography = rows[0]
+        people = People(username, hostname)
+        if biography is not None and not hasattr(people, '_biography'):
+            people._biography = biography
+        return people
+
+    @staticmethod
+    def _sync_key(server, query):
+        params = sorted([(x, y) for (x, y) in query._params.items()
+                if x != 'since'])
+        return json.dumps([server.hostname, query._url, params])
+
+    def high_water_mark(self, server, query):
+        """Return the time (as a timestamp) of the most recent update synced
+        for this query, or None if it was never synced."""
+        rows = self._execute('SELECT updated FROM sync WHERE query = ?',
+                (self._sync_key(server, query),))
+        return rows[0][0] if rows else None
+
+    def sync(self, server, query=None):
+        """Fetch the entries matching the query which were updated since the
+        previous sync of this query, and store them. Return the number of
+        entries stored.
+
+        :param server: The server the query is sent to.
+        :param query: A :py:class:`wididit.Entry.Query`, which is not
+                      changed. Defaults to all entries of the server.
+        """
+        if query is None:
+            query = Entry.Query(server, Entry.Query.MODE_ALL)
+        key = self._sync_key(server, query)
+        mark = self.high_water_mark(server, query)
+        replies = []
+        if mark is None:
+            replies = list(query._iterate(raw=True))
+        else:
+            # Times have a resolution of one second, so entries updated
+            # during the second of the mark may have been stored or not.
+            stored = set(self._execute('SELECT author, id, updated '
+                'FROM entry WHERE updated >= ?', (mark,)))
+            for reply in query.copy().since(mark - 1)._iterate(raw=True):
+                if (utils.reply_userid(reply['author']), reply['id'],
+                        utils.parse_time(reply['updated'])) not in stored:
+                    replies.append(reply)
+        count = self.add(replies)
+        for reply in replies:
+            updated = utils.parse_time(reply['updated'])
+            if mark is None or updated > mark:
+                mark = updated
+        if mark is not None:
+            with self._lock:
+                with self._connection:
+                    self._connection.execute('INSERT OR REPLACE INTO sync '
+                            '(query, updated) VALUES (?, ?)', (key, mark))
+        return count
+
+    def fetch(self, query):
+        """Return the entries of the mirror matching the filters of this
+        query, without any request to the server.
+
+        :param query: A :py:class:`wididit.Entry.Query`.
+        """
+        return list(self._iterate(query))
+
+    def _iterate(self, query):
+        conditions = []
+        parameters = []
+        authors = query._params.get('author')
+        if authors:
+            conditions.append('author IN (%s)' % ', '.join('?' * len(authors)))
+            parameters.extend(authors)
+        for text in query._params.get('content', ()):
+            conditions.append('instr(content, ?) > 0')
+            parameters.append(text)
+        if query._since is not None:
+            conditions.append('updated > ?')
+            parameters.append(query._since)
+        statement = 'SELECT %s FROM entry' % ', '.join(_columns)
+        if conditions:
+            statement += ' WHERE ' + ' AND '.join(conditions)
+        statement += ' ORDER BY updated DESC, author, id'
+        if query._limit is not None:
+            statement += ' LIMIT ?'
+            parameters.append(query._limit)
+        for row in self._execute(statement, parameters):
+            reply = dict(zip(_columns, row))
+            reply['contributors'] = json.loads(reply['contributors'])
+            reply['published'] = utils.format_time(reply['published'])
+            reply['updated'] = utils.format_time(reply['updated'])
+            yield Entry.from_reply(reply)
@@ -19,9 +19,90 @@
 # THE SOFTWARE.
 
 import re
+import sys
+import time
+import calendar
+import threading
+import collections
+try:
+    import Queue as queue
+except ImportError: # Python 3
+    import queue
 
 from wididit import constants
 
+try:
+    string_types = (str, unicode)
+except NameError: # Python 3
+    string_types = (str,)
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+"""The format of times in the API. They are in UTC."""
+
+_TIME_CACHE_SIZE = 4096
+_parsed_times = {}
+_formatted_times = {}
+_time_regexp = re.compile(
+        r'([0-9]{4})-([0-9]{2})-([0-9]{2}) ([0-9]{2}):([0-9]{2}):([0-9]{2})\Z')
+
+def _days_from_civil(year, month, day):
+    """Returns the number of days between 1970-01-01 and this date, in the
+    proleptic Gregorian calendar."""
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + \
+            day_of_year
+    return era * 146097 + day_of_era - 719468
+
+def parse_time(string):
+    """Takes a time in the API format and returns it as a number of seconds
+    since the epoch.
+
+    Raises ValueError if the string is not in the API format."""
+    result = _parsed_times.get(string)
+    if result is not None:
+        return result
+    match = _time_regexp.match(string)
+    if match is None:
+        raise ValueError('time data %r does not match format %r' %
+                (string, TIME_FORMAT))
+    (year, month, day, hour, minute, second) = map(int, match.groups())
+    if not (1 <= month <= 12 and hour <= 23 and minute <= 59 and
+            second <= 61) or not 1 <= day <= calendar.mdays[month] + \
+            (month == 2 and calendar.isleap(year)):
+        raise ValueError('time data %r is out of range' % string)
+    timestamp = _days_from_civil(year, month, day) * 86400 + \
+            hour * 3600 + minute * 60 + second
+    if len(_parsed_times) >= _TIME_CACHE_SIZE:
+        _parsed_times.clear()
+    _parsed_times[string] = timestamp
+    return timestamp
+
+def format_time(timestamp):
+    """Takes a number of seconds since the epoch and returns it in the API
+    format."""
+    result = _formatted_times.get(timestamp)
+    if result is not None:
+        return result
+    # Same as strftime(TIME_FORMAT), which is much slower.
+    string = '%04d-%02d-%02d %02d:%02d:%02d' % time.gmtime(timestamp)[:6]
+    if len(_formatted_times) >= _TIME_CACHE_SIZE:
+        _formatted_times.clear()
+    _formatted_times[timestamp] = string
+    return string
+
+def intern_string(string):
+    """Returns an interned version of the string, if it can be interned (on
+    Python 2, only byte strings can)."""
+    try:
+        return _intern(string)
+    except TypeError:
+        return string
+_intern = getattr(sys, 'intern', None) or intern
+
 def userid2tuple(userid, default_server=None):
     """Takes a userid and returns a tuple (username, server).
 
@@ -36,27 +117,164 @@ def userid2tuple(userid, default_server=None):
             raise ValueError()
         return (userid, default_server)
 
-_tag_regexp = re.compile('(?<!\S)(#[^ .,;:?!]{,%i})' %
+def reply_userid(author):
+    """Takes the author from a server reply (a userid or a dictionary) and
+    returns its userid."""
+    if isinstance(author, string_types):
+        return author
+    return '%s@%s' % (author['username'], author['server']['hostname'])
+
+_tag_regexp = re.compile(r'(?<!\S)(#[^ .,;:?!]{,%i})' %
         (constants.MAX_TAG_LENGTH))
 def get_tags(content):
     """Returns all :ref:`concepts-tags` from the text."""
     return _tag_regexp.findall(content)
 
-def _tag_process_tree(tree, tags):
-    if len(tags) == 0:
-        return
-    tag = ''
-    while tag == '':
-        tag = tags.pop(0)
-    if tag not in tree:
-        tree.update({tag: {}})
-    _tag_process_tree(tree[tag], tags)
+class TagTree(dict):
+    """A tree of tags, mapping the names of the children of a tag to their
+    own trees (see :ref:`concepts-tag-trees`).
+
+    :py:attr:`count` is the number of texts in which the tag, or one of its
+    descendants, appears. For the root of the tree, it is the number of
+    texts."""
+    __slots__ = ('count',)
+
 def get_tag_tree(content):
     """Returns all tags in the text, and processes :ref:`concepts-tag-trees`
     as dicts."""
-    raw_tags = get_tags(content)
     tree = {}
-    for tag in raw_tags:
-        tags = tag.split('#')
-        _tag_process_tree(tree, tags)
+    for tag in _tag_regexp.findall(content):
+        node = tree
+        for name in tag.split('#'):
+            if name:
+                node = node.setdefault(name, {})
     return tree
+
+def get_tag_tree_many(contents):
+    """Returns the tags of all the texts, merged in a single
+    :py:class:`TagTree`.
+
+    :param contents: An iterable of texts.
+    """
+    tree = TagTree()
+    tree.count = 0
+    findall = _tag_regexp.findall
+    for content in contents:
+        tree.count += 1
+        nodes = {}
+        for tag in findall(content):
+            node = tree
+            for name in tag.split('#'):
+                if not name:
+                    continue
+                child = node.get(name)
+                if child is None:
+                    child = node[name] = TagTree()
+                    child.count = 0
+                node = child
+                nodes[id(node)] = node
+        for node in nodes.values():
+            node.count += 1
+    return tree
+
+class BackgroundCall(object):
+    """Call a function in a separate thread.
+
+    :param function: The function to be called.
+    :param *args: Its arguments.
+    :param **kwargs: Its keyword-arguments.
+    """
+    def __init__(self, function, *args, **kwargs):
+        self._result = None
+        self._exc_info = None
+        self._thread = threading.Thread(target=self._run,
+                args=(function, args, kwargs))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, function, args, kwargs):
+        try:
+            self._result = function(*args, **kwargs)
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+    def wait(self, timeout=None):
+        """Wait for the call to finish.
+
+        :param timeout: The maximum time to wait, in seconds."""
+        self._thread.join(timeout)
+
+    def done(self):
+        """Determines whether or not the call is finished."""
+        return not self._thread.is_alive()
+
+    def result(self, timeout=None):
+        """Wait for the call to finish, and return its return value (or raise
+        its exception).
+
+        :param timeout: The maximum time to wait, in seconds. If it is
+                        exceeded, threading.ThreadError is raised."""
+        self.wait(timeout)
+        if not self.done():
+            raise threading.ThreadError('Call not finished.')
+        if self._exc_info is not None:
+            raise self._exc_info[1]
+        return self._result
+
+class _QueuedCall(BackgroundCall):
+    """A call run by a worker thread of :py:func:`map_concurrently`."""
+    def __init__(self, function, *args, **kwargs):
+        self._result = None
+        self._exc_info = None
+        self._call = (function, args, kwargs)
+        self._finished = threading.Event()
+
+    def run(self):
+        try:
+            self._run(*self._call)
+        finally:
+            self._finished.set()
+
+    def wait(self, timeout=None):
+        self._finished.wait(timeout)
+
+    def done(self):
+        return self._finished.is_set()
+
+def _run_queued_calls(calls):
+    while True:
+        call = calls.get()
+        if call is None:
+            return
+        call.run()
+
+def map_concurrently(function, iterable, concurrency):
+    """Call the function on each item of the iterable, with up to
+    `concurrency` calls running at the same time in a pool of threads.
+
+    Items are read as needed, and finished calls (with the interface of
+    :py:class:`BackgroundCall`) are yielded in the order of the items."""
+    tasks = queue.Queue(concurrency)
+    workers = [threading.Thread(target=_run_queued_calls, args=(tasks,))
+            for x in range(concurrency)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    # Calls which are queued or running, in the order of the items.
+    calls = collections.deque()
+    try:
+        for item in iterable:
+            if len(calls) >= 2 * concurrency:
+                call = calls.popleft()
+                call.wait()
+                yield call
+            call = _QueuedCall(function, item)
+            calls.append(call)
+            tasks.put(call)
+        while calls:
+            call = calls.popleft()
+            call.wait()
+            yield call
+    finally:
+        for worker in workers:
+            tasks.put(None)
@@ -18,28 +18,145 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import weakref
+import threading
+import collections
+
+class InstanceRegistry(object):
+    """Identity map of the instances of a singleton class.
+
+    Instances are only referenced weakly, so they are freed as soon as nobody
+    uses them anymore. The `strong_size` most recently used instances are
+    also kept alive by the registry itself.
+
+    :param strong_size: The number of instances kept alive by the registry.
+                        None means all of them are.
+    """
+    def __init__(self, strong_size=0):
+        self._weak = weakref.WeakValueDictionary()
+        self._strong = collections.OrderedDict()
+        self._strong_size = strong_size
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        """Return the instance registered with this key, or None."""
+        with self._lock:
+            instance = self._weak.get(key)
+            if instance is not None and self._strong_size != 0:
+                self._keep(key, instance)
+            return instance
+
+    def add(self, key, instance):
+        """Register an instance with this key."""
+        with self._lock:
+            self._weak[key] = instance
+            if self._strong_size != 0:
+                self._keep(key, instance)
+
+    def _keep(self, key, instance):
+        self._strong.pop(key, None)
+        self._strong[key] = instance
+        self._trim()
+
+    def _trim(self):
+        while self._strong_size is not None and \
+                len(self._strong) > self._strong_size:
+            self._strong.popitem(last=False)
+
+    def get_strong_size(self):
+        return self._strong_size
+    def set_strong_size(self, value):
+        with self._lock:
+            self._strong_size = value
+            self._trim()
+    strong_size = property(get_strong_size, set_strong_size,
+            'The number of instances kept alive by the registry.')
+
+    def instances(self):
+        """Return a list of all living instances."""
+        with self._lock:
+            return list(self._weak.values())
+
+    def clear(self):
+        """Forget all instances."""
+        with self._lock:
+            self._weak.clear()
+            self._strong.clear()
+
+    def __len__(self):
+        return len(self._weak)
+
+    def __contains__(self, key):
+        return key in self._weak
+
 class WididitObject(object):
     """Base class for all Wididit classes.
 
     All subclasses of this class with _singleton=True are parametric singletons,
     according to the parameters they give to super()'s __new__.
-    This class also provides __repr__ and __eq__ based on class and parameters
-    given to super()'s __new__.
+    Each of these classes has its own :py:class:`InstanceRegistry`, whose
+    size can be set with :py:meth:`set_strong_cache_size`.
+    This class also provides __repr__, __eq__ and __hash__ based on class and
+    parameters given to super()'s __new__.
     """
+    __slots__ = ('_parameters', '__weakref__')
     _singleton = False
-    __instances = {}
+    _strong_cache_size = 0
+    __registries = {}
+    __registries_lock = threading.Lock()
     def __new__(cls, *args):
         if not cls._singleton:
             instance = object.__new__(cls)
             instance._parameters = args
             return instance
-        if cls not in cls.__instances:
-            cls.__instances[cls] = {}
-        if args not in cls.__instances[cls]:
-            instance = object.__new__(cls)
-            instance._parameters = args
-            cls.__instances[cls][args] = instance
-        return cls.__instances[cls][args]
+        registry = cls.get_registry()
+        with registry._lock:
+            instance = registry.get(args)
+            if instance is None:
+                instance = object.__new__(cls)
+                instance._parameters = args
+                registry.add(args, instance)
+        return instance
+
+    @classmethod
+    def get_registry(cls):
+        """Return the :py:class:`InstanceRegistry` of this class."""
+        with cls.__registries_lock:
+            if cls not in cls.__registries:
+                cls.__registries[cls] = InstanceRegistry(
+                        cls._strong_cache_size)
+            return cls.__registries[cls]
+
+    @classmethod
+    def instances(cls):
+        """Return a list of all living instances of this class (and of its
+        subclasses)."""
+        with cls.__registries_lock:
+            registries = [y for (x, y) in cls.__registries.items()
+                    if issubclass(x, cls)]
+        return sum([x.instances() for x in registries], [])
+
+    @classmethod
+    def clear_instances(cls):
+        """Forget all instances of this class (and of its subclasses).
+
+        New instances will be created, even for parameters already used."""
+        with cls.__registries_lock:
+            registries = [y for (x, y) in cls.__registries.items()
+                    if issubclass(x, cls)]
+        for registry in registries:
+            registry.clear()
+
+    @classmethod
+    def set_strong_cache_size(cls, size):
+        """Set the number of recently used instances of this class kept
+        alive, even if they are not used anymore.
+
+        :param size: The number of instances. Defaults to 0, which means
+                     instances are freed as soon as they are not used, and
+                     None means they are never freed."""
+        cls._strong_cache_size = size
+        cls.get_registry().strong_size = size
 
     def __repr__(self):
         return '%s.%s(%s)' % (
@@ -52,6 +169,30 @@ class WididitObject(object):
         return self.__class__ is other.__class__ and \
                 self._parameters == other._parameters
 
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.__class__, self._parameters))
+
+    def _conditional_headers(self):
+        """Return the headers making a GET request conditional on this object
+        having changed since it was last synced."""
+        headers = {}
+        validators = getattr(self, '_validators', None)
+        if validators:
+            if 'ETag' in validators:
+                headers['If-None-Match'] = validators['ETag']
+            if 'Last-Modified' in validators:
+                headers['If-Modified-Since'] = validators['Last-Modified']
+        return headers
+
+    def _store_validators(self, response):
+        """Remember the validators of the representation of this object
+        from a server response."""
+        self._validators = dict([(x, response.headers[x])
+                for x in ('ETag', 'Last-Modified') if x in response.headers])
+
     def sync(self):
         """Update the state of this object.
 